@@ -1,81 +1,105 @@
-from flask import Flask,request, g
-from flask_cors import CORS
+from flask import Flask, Response
+import orjson
 import os
 import atexit
 from dotenv import load_dotenv
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
 import time
+from pathlib import Path
+from logging.handlers import RotatingFileHandler, MemoryHandler, QueueHandler, QueueListener
 from datetime import datetime, timezone
 
 # Load environment variables
 load_dotenv()
 
+# Imported after load_dotenv so config.database sees the DB_* settings
+from config.database import initialize_db_pool, close_db_pool, get_db_context, get_pool_stats
+from utils.batch_writer import stop_batch_writers
+from utils.middleware import RequestTimingMiddleware, CORSMiddleware
+from utils.response_handler import APIResponse, ResponseCode, ResponseStatus
+
+# Static part of the /health payload
+HEALTHY_STATUS = {'status': 'healthy', 'database': 'connected'}
+
+# A successful /health DB ping is reused for this many seconds
+HEALTH_TTL = 2.0
+_health_cache = {'ok': False, 'checked_at': 0.0, 'pool_stats': {}}
+
+def _healthy_response(pool_stats):
+    return APIResponse.success(
+        data=dict(
+            HEALTHY_STATUS,
+            timestamp=datetime.now(timezone.utc),
+            pool_stats=pool_stats
+        ),
+        message="Service is healthy"
+    )
+
+_DIRS_READY = False
+
+def _ensure_dirs(upload_dir):
+    """Create the upload and log folders once per process"""
+    global _DIRS_READY
+    if _DIRS_READY:
+        return
+    Path(upload_dir).mkdir(parents=True, exist_ok=True)
+    Path('logs').mkdir(exist_ok=True)
+    _DIRS_READY = True
+
 def create_app():
     app = Flask(__name__)
     
-    # CORS configuration
-    CORS(app, 
-         origins=[ 'http://localhost:5173'],  # Frontend URL
-         allow_headers=['Content-Type', 'Authorization'],
-         expose_headers=['X-Total-Count', 'X-Total-Pages'],
-         methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
-    
     # Configuration
     app.config.update({
         'SECRET_KEY': os.environ.get('SECRET_KEY', 'your-secret-key-here'),
         'JWT_SECRET_KEY': os.environ.get('JWT_SECRET_KEY', 'jwt-secret-string'),
         'UPLOAD_FOLDER': os.environ.get('UPLOAD_FOLDER', 'uploads'),
         'MAX_CONTENT_LENGTH': 16 * 1024 * 1024,  # 16MB max file size
+        # Behind a proxy that honours X-Sendfile, let it send file bodies
+        'USE_X_SENDFILE': os.environ.get('USE_X_SENDFILE', 'false').lower() == 'true',
         'DATABASE_POOL_SIZE': int(os.environ.get('DATABASE_POOL_SIZE', '10')),
-        'DATABASE_POOL_MAX': int(os.environ.get('DATABASE_POOL_MAX', '20')),
-        'JSONIFY_PRETTYPRINT_REGULAR': True,
-        'JSON_SORT_KEYS': False
+        'DATABASE_POOL_MAX': int(os.environ.get('DATABASE_POOL_MAX', '20'))
     })
     
-    # Setup enhanced logging
-    setup_logging(app)
+    # Serialize responses with orjson instead of the stdlib encoder; output
+    # is compact (and key order preserved) except in debug mode
+    from utils.json_provider import ORJSONProvider, API_OPTIONS
+    app.json = ORJSONProvider(app)
     
-    # Create upload folder if it doesn't exist
-    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    # Parse multipart uploads with larger reads than Werkzeug's default
+    from utils.form_parser import UploadRequest
+    app.request_class = UploadRequest
+    
+    # Create the upload and log folders, then setup enhanced logging
+    _ensure_dirs(app.config['UPLOAD_FOLDER'])
+    setup_logging(app)
     
     # Initialize database connection pool
-    from config.database import initialize_db_pool
-    initialize_db_pool()
+    initialize_db_pool(
+        min_connections=app.config['DATABASE_POOL_SIZE'],
+        max_connections=app.config['DATABASE_POOL_MAX']
+    )
     app.logger.info("Database connection pool initialized")
     
     # Register cleanup function
     @atexit.register
     def cleanup():
-        from config.database import close_db_pool
+        stop_batch_writers()
         close_db_pool()
         app.logger.info("Application cleanup completed")
     
-    # Request/Response middleware
-    @app.before_request
-    def before_request():
-        g.start_time = time.time()
-        app.logger.info(f"Request: {request.method} {request.path}")
+    # Security headers, response timing and request logs
+    app.wsgi_app = RequestTimingMiddleware(app.wsgi_app, app.logger, quiet_paths={'/health'})
     
-    @app.after_request
-    def after_request(response):
-        # Security headers
-        response.headers['X-Content-Type-Options'] = 'nosniff'
-        response.headers['X-Frame-Options'] = 'DENY'
-        response.headers['X-XSS-Protection'] = '1; mode=block'
-        
-        # CORS headers for pagination
-        if hasattr(g, 'total_count'):
-            response.headers['X-Total-Count'] = str(g.total_count)
-        if hasattr(g, 'total_pages'):
-            response.headers['X-Total-Pages'] = str(g.total_pages)
-        
-        # Log response time
-        if hasattr(g, 'start_time'):
-            duration = time.time() - g.start_time
-            app.logger.info(f"Response: {response.status_code} - {duration:.3f}s")
-        
-        return response
+    # CORS configuration; outermost so preflights never reach Flask
+    app.wsgi_app = CORSMiddleware(
+        app.wsgi_app,
+        origin=os.environ.get('CORS_ORIGIN', 'http://localhost:5173'),  # Frontend URL
+        methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
+        headers=['Content-Type', 'Authorization'],
+        expose_headers=['X-Total-Count', 'X-Total-Pages']
+    )
     
     # Import and register blueprints
     from routes.auth_routes import auth_bp
@@ -103,30 +127,24 @@ def create_app():
     # Health check endpoint
     @app.route('/health')
     def health_check():
-        from utils.response_handler import APIResponse, ResponseCode
+        # Load balancers poll this every few seconds; reuse a recent
+        # successful ping instead of borrowing a connection each time
+        now = time.monotonic()
+        if _health_cache['ok'] and now - _health_cache['checked_at'] < HEALTH_TTL:
+            return _healthy_response(_health_cache['pool_stats'])
         
         try:
             # Test database connection using context manager
-            from config.database import get_db_context
             with get_db_context() as conn:
                 cursor = conn.cursor()
                 cursor.execute("SELECT 1")
                 cursor.fetchone()
             
-            # Get pool stats
-            from config.database import _db_pool
-            pool_stats = _db_pool.get_pool_stats() if _db_pool else {}
-            
-            return APIResponse.success(
-                data={
-                    'status': 'healthy',
-                    'timestamp': datetime.now(timezone.utc).isoformat() + "Z",
-                    'database': 'connected',
-                    'pool_stats': pool_stats
-                },
-                message="Service is healthy"
-            )
+            pool_stats = get_pool_stats()
+            _health_cache.update(ok=True, checked_at=now, pool_stats=pool_stats)
+            return _healthy_response(pool_stats)
         except Exception as e:
+            _health_cache.update(ok=False, checked_at=now)
             return APIResponse.error(
                 message="Service is unhealthy",
                 details=str(e),
@@ -136,74 +154,77 @@ def create_app():
     # API documentation endpoint
     @app.route('/api/docs')
     def api_docs():
-        from utils.response_handler import APIResponse
-        
-        docs = {
-            "api_version": "2.0",
-            "title": "Hotpoint Expense Management System API",
-            "description": "Enhanced API with RBAC, connection pooling, and standardized responses",
-            "endpoints": {
-                "authentication": {
-                    "signup": {"method": "POST", "url": "/api/auth/signup", "auth": False},
-                    "login": {"method": "POST", "url": "/api/auth/login", "auth": False},
-                    "logout": {"method": "POST", "url": "/api/auth/logout", "auth": True},
-                    "verify": {"method": "GET", "url": "/api/auth/verify", "auth": True}
-                },
-                "expenses": {
-                    "list": {"method": "GET", "url": "/api/expenses", "auth": True, "permissions": ["view_expenses"]},
-                    "create": {"method": "POST", "url": "/api/expenses", "auth": True, "permissions": ["create_expenses"]},
-                    "details": {"method": "GET", "url": "/api/expenses/<id>", "auth": True, "permissions": ["view_expenses"]},
-                    "approve": {"method": "POST", "url": "/api/expenses/<id>/approve", "auth": True, "permissions": ["approve_expenses"]},
-                    "reject": {"method": "POST", "url": "/api/expenses/<id>/reject", "auth": True, "permissions": ["reject_expenses"]}
-                },
-                "floats": {
-                    "list": {"method": "GET", "url": "/api/floats", "auth": True, "permissions": ["view_floats"]},
-                    "create": {"method": "POST", "url": "/api/floats", "auth": True, "permissions": ["create_floats"]},
-                    "update": {"method": "PUT", "url": "/api/floats/<id>", "auth": True, "permissions": ["update_floats"]},
-                    "delete": {"method": "DELETE", "url": "/api/floats/<id>", "auth": True, "permissions": ["delete_floats"]}
-                },
-                "reports": {
-                    "dashboard": {"method": "GET", "url": "/api/reports/dashboard", "auth": True, "permissions": ["view_reports"]},
-                    "expenses": {"method": "GET", "url": "/api/reports/expenses", "auth": True, "permissions": ["view_reports"]},
-                    "floats": {"method": "GET", "url": "/api/reports/floats", "auth": True, "permissions": ["view_reports"]}
-                }
+        return Response(docs_body, mimetype='application/json')
+    
+    # The docs never change at runtime, so encode the response body once
+    docs = {
+        "api_version": "2.0",
+        "title": "Hotpoint Expense Management System API",
+        "description": "Enhanced API with RBAC, connection pooling, and standardized responses",
+        "endpoints": {
+            "authentication": {
+                "signup": {"method": "POST", "url": "/api/auth/signup", "auth": False},
+                "login": {"method": "POST", "url": "/api/auth/login", "auth": False},
+                "logout": {"method": "POST", "url": "/api/auth/logout", "auth": True},
+                "verify": {"method": "GET", "url": "/api/auth/verify", "auth": True}
             },
-            "response_format": {
-                "success": {
-                    "status": "success",
-                    "message": "Operation successful",
-                    "timestamp": "2024-01-01T00:00:00Z",
-                    "code": 200,
-                    "data": "Response data here",
-                    "meta": "Optional metadata (pagination, etc.)"
-                },
-                "error": {
-                    "status": "error",
-                    "message": "Error description",
-                    "timestamp": "2024-01-01T00:00:00Z",
-                    "code": 400,
-                    "details": "Optional error details",
-                    "error_code": "Optional error code"
-                }
+            "expenses": {
+                "list": {"method": "GET", "url": "/api/expenses", "auth": True, "permissions": ["view_expenses"]},
+                "create": {"method": "POST", "url": "/api/expenses", "auth": True, "permissions": ["create_expenses"]},
+                "details": {"method": "GET", "url": "/api/expenses/<id>", "auth": True, "permissions": ["view_expenses"]},
+                "approve": {"method": "POST", "url": "/api/expenses/<id>/approve", "auth": True, "permissions": ["approve_expenses"]},
+                "reject": {"method": "POST", "url": "/api/expenses/<id>/reject", "auth": True, "permissions": ["reject_expenses"]}
             },
-            "authentication": {
-                "type": "JWT Bearer Token",
-                "header": "Authorization: Bearer <token>",
-                "token_expiry": "24 hours"
+            "floats": {
+                "list": {"method": "GET", "url": "/api/floats", "auth": True, "permissions": ["view_floats"]},
+                "create": {"method": "POST", "url": "/api/floats", "auth": True, "permissions": ["create_floats"]},
+                "update": {"method": "PUT", "url": "/api/floats/<id>", "auth": True, "permissions": ["update_floats"]},
+                "delete": {"method": "DELETE", "url": "/api/floats/<id>", "auth": True, "permissions": ["delete_floats"]}
+            },
+            "reports": {
+                "dashboard": {"method": "GET", "url": "/api/reports/dashboard", "auth": True, "permissions": ["view_reports"]},
+                "expenses": {"method": "GET", "url": "/api/reports/expenses", "auth": True, "permissions": ["view_reports"]},
+                "floats": {"method": "GET", "url": "/api/reports/floats", "auth": True, "permissions": ["view_reports"]}
+            }
+        },
+        "response_format": {
+            "success": {
+                "status": "success",
+                "message": "Operation successful",
+                "timestamp": "2024-01-01T00:00:00Z",
+                "code": 200,
+                "data": "Response data here",
+                "meta": "Optional metadata (pagination, etc.)"
+            },
+            "error": {
+                "status": "error",
+                "message": "Error description",
+                "timestamp": "2024-01-01T00:00:00Z",
+                "code": 400,
+                "details": "Optional error details",
+                "error_code": "Optional error code"
             }
+        },
+        "authentication": {
+            "type": "JWT Bearer Token",
+            "header": "Authorization: Bearer <token>",
+            "token_expiry": "24 hours"
         }
-        
-        return APIResponse.success(data=docs, message="API documentation")
+    }
+    
+    docs_body = orjson.dumps({
+        "status": ResponseStatus.SUCCESS.value,
+        "message": "API documentation",
+        "timestamp": datetime.now(timezone.utc),
+        "code": ResponseCode.OK.value,
+        "data": docs
+    }, option=API_OPTIONS)
     
     return app
 
 def setup_logging(app):
     """Setup enhanced logging configuration"""
     if not app.debug and not app.testing:
-        # Create logs directory if it doesn't exist
-        if not os.path.exists('logs'):
-            os.mkdir('logs')
-        
         # Setup file handler with rotation
         file_handler = RotatingFileHandler('logs/hotpoint_api.log', 
                                          maxBytes=10240000, backupCount=10)
@@ -211,7 +232,11 @@ def setup_logging(app):
             '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
         ))
         file_handler.setLevel(logging.INFO)
-        app.logger.addHandler(file_handler)
+        
+        # Buffer file writes; flushed in bursts or as soon as an error arrives
+        buffered_file_handler = MemoryHandler(capacity=1000, flushLevel=logging.ERROR,
+                                              target=file_handler)
+        buffered_file_handler.setLevel(logging.INFO)
         
         # Setup console handler for development
         console_handler = logging.StreamHandler()
@@ -219,7 +244,19 @@ def setup_logging(app):
             '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
         ))
         console_handler.setLevel(logging.INFO)
-        app.logger.addHandler(console_handler)
+        
+        # Request threads only enqueue records; a background listener
+        # formats and writes them
+        log_queue = queue.SimpleQueue()
+        app.logger.addHandler(QueueHandler(log_queue))
+        listener = QueueListener(log_queue, buffered_file_handler, console_handler,
+                                 respect_handler_level=True)
+        listener.start()
+        
+        @atexit.register
+        def stop_log_listener():
+            listener.stop()
+            buffered_file_handler.close()
         
         app.logger.setLevel(logging.INFO)
         app.logger.info('Hotpoint API startup')
@@ -275,7 +312,7 @@ def register_enhanced_error_handlers(app):
     
     @app.errorhandler(500)
     def internal_error(error):
-        app.logger.error(f"Internal server error: {str(error)}")
+        app.logger.error("Internal server error: %s", error)
         return APIResponse.error(
             message="Internal server error",
             details="An unexpected error occurred" if not app.debug else str(error),
@@ -284,7 +321,7 @@ def register_enhanced_error_handlers(app):
     
     @app.errorhandler(Exception)
     def handle_unexpected_error(error):
-        app.logger.exception(f"Unexpected error: {str(error)}")
+        app.logger.exception("Unexpected error: %s", error)
         return APIResponse.error(
             message="Unexpected error occurred",
             details=str(error) if app.debug else "Please contact support",
@@ -302,7 +339,7 @@ if __name__ == '__main__':
     print("🚀 HOTPOINT EXPENSE MANAGEMENT SYSTEM API")
     print("="*60)
     print(f"📅 Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"🌐 Environment: {'Development' if app.debug else 'Production'}")
+    print(f"🌐 Environment: {'Development' if os.environ.get('FLASK_ENV') == 'development' else 'Production'}")
     print(f"📂 Upload folder: {app.config['UPLOAD_FOLDER']}")
     print(f"🔧 Max file size: {app.config['MAX_CONTENT_LENGTH'] / (1024*1024):.0f}MB")
     print("="*60)
@@ -312,9 +349,16 @@ if __name__ == '__main__':
     print("   • Main API: http://localhost:5000/api/")
     print("="*60)
     
-    app.run(
-        debug=True,
-        port=5000,
-        host='0.0.0.0',  # Allow external connections
-        threaded=True    # Enable threading for better concurrency
-    )
\ No newline at end of file
+    if os.environ.get('FLASK_ENV') == 'development':
+        app.run(
+            debug=True,
+            port=5000,
+            host='0.0.0.0',  # Allow external connections
+            threaded=True    # Enable threading for better concurrency
+        )
+    else:
+        # Production: waitress thread pool; keep DATABASE_POOL_MAX >= WEB_THREADS
+        # so no request thread waits on a DB connection
+        from waitress import serve
+        serve(app, host='0.0.0.0', port=5000,
+              threads=int(os.environ.get('WEB_THREADS', '16')))
\ No newline at end of file
@@ -1,21 +1,51 @@
 import pyodbc
 import logging
+import os
 import threading
-from queue import Queue
+import queue
 from contextlib import contextmanager
 import time
-from datetime import datetime, timedelta
+
+# The application keeps its own pool below; the ODBC driver manager's pooling
+# would only add a second layer of cached handles (and leaks under unixODBC).
+pyodbc.pooling = False
+
+# Enumerating drivers walks the ODBC driver manager, so do it once per process
+SQL_SERVER_DRIVERS = [d for d in pyodbc.drivers() if 'SQL Server' in d]
+
+DB_SERVER = os.environ.get('DB_SERVER', "HOTPOINT11-20\\SQLEXPRESS")
+DB_NAME = os.environ.get('DB_NAME', "hotpoint_db")
+
+def build_connection_string(server, database, connection_timeout=30):
+    """Build the ODBC connection string for the first SQL Server driver found"""
+    return (
+        f'DRIVER={{{SQL_SERVER_DRIVERS[0]}}};'
+        f'SERVER={server};'
+        f'DATABASE={database};'
+        f'Trusted_Connection=yes;'
+        f'Connection Timeout={connection_timeout};'
+    )
+
+# ODBC SQL_ATTR_PACKET_SIZE (not exported by pyodbc). Request the TDS maximum
+# instead of the 4 KB default so larger result sets need fewer packets.
+SQL_ATTR_PACKET_SIZE = 112
+CONNECT_ATTRS = {SQL_ATTR_PACKET_SIZE: 32767}
+
+# Connection string for the configured database, built once at import
+CONNECTION_STRING = build_connection_string(DB_SERVER, DB_NAME) if SQL_SERVER_DRIVERS else None
 
 class ConnectionWrapper:
     """ Wrapper for pyodbc connection to add custom attributes """
+    # Only the methods below are exposed; no __getattr__ fallthrough
+    __slots__ = ('_connection', 'last_used', 'created_at', 'error_count')
+    
     def __init__(self, connection):
         self._connection = connection
-        self.last_used = datetime.now()
-        self.created_at = datetime.now()
-    
-    def __getattr__(self, name):
-        # Delegate all other attributes to the underlying connection
-        return getattr(self._connection, name)
+        # time.monotonic() floats: cheaper than datetime and immune to clock changes
+        self.last_used = time.monotonic()
+        self.created_at = self.last_used
+        # Driver errors seen since the last successful ping
+        self.error_count = 0
     
     def __enter__(self):
         return self
@@ -23,21 +53,31 @@ class ConnectionWrapper:
     def __exit__(self, exc_type, exc_val, exc_tb):
         # Dont close the connection here, let the pool handle it
         if exc_type:
+            if issubclass(exc_type, pyodbc.Error):
+                self.error_count += 1
             try:
                 self.rollback()
             except:
                 pass
 
     def cursor(self):
-        self.last_used = datetime.now()
-        return self._connection.cursor()
+        self.last_used = time.monotonic()
+        cursor = self._connection.cursor()
+        # Send executemany() parameters as one bound array instead of a
+        # round trip per row; plain execute() is unaffected
+        cursor.fast_executemany = True
+        return cursor
+    
+    def execute(self, *args):
+        self.last_used = time.monotonic()
+        return self._connection.execute(*args)
     
     def commit(self):
-        self.last_used = datetime.now()
+        self.last_used = time.monotonic()
         return self._connection.commit()
     
     def rollback(self):
-        self.last_used = datetime.now()
+        self.last_used = time.monotonic()
         return self._connection.rollback()
     
     def close(self):
@@ -52,6 +92,9 @@ class ConnectionWrapper:
         self._connection.autocommit = value
 
 class DatabasePool:
+    # Connections used this recently are handed out without a liveness ping
+    FRESH_SECONDS = 30.0
+    
     def __init__(self, server, database, min_connections=5, max_connections=20, connection_timeout=30):
         self.server = server
         self.database = database
@@ -59,23 +102,23 @@ class DatabasePool:
         self.max_connections = max_connections
         self.connection_timeout = connection_timeout
         
-        self._pool = Queue(maxsize=max_connections)
-        self._all_connections = []
-        self._lock = threading.RLock()
+        # Bounded by _created_connections, so no maxsize is needed
+        self._pool = queue.SimpleQueue()
+        # Every live connection, keyed by id() for O(1) eviction
+        self._all_connections = {}
+        # Guards only the counter and the dict; never held across a connect
+        self._lock = threading.Lock()
         self._created_connections = 0
         
         # Connection string template
-        self.drivers = [d for d in pyodbc.drivers() if 'SQL Server' in d]
+        self.drivers = SQL_SERVER_DRIVERS
         if not self.drivers:
             raise Exception("No SQL Server ODBC drivers found. Please install ODBC Driver 17/18 for SQL Server")
         
-        self.connection_string = (
-            f'DRIVER={{{self.drivers[0]}}};'
-            f'SERVER={server};'
-            f'DATABASE={database};'
-            f'Trusted_Connection=yes;'
-            f'Connection Timeout={connection_timeout};'
-        )
+        if (server, database, connection_timeout) == (DB_SERVER, DB_NAME, 30):
+            self.connection_string = CONNECTION_STRING
+        else:
+            self.connection_string = build_connection_string(server, database, connection_timeout)
         
         # Initialize minimum connections
         self._initialize_pool()
@@ -84,118 +127,145 @@ class DatabasePool:
         """Create a new database connection"""
         try:
             # Create the raw pyodbc connection
-            raw_conn = pyodbc.connect(self.connection_string)
+            raw_conn = pyodbc.connect(self.connection_string, attrs_before=CONNECT_ATTRS)
             raw_conn.autocommit = False
+            # Session setting: no DONE_IN_PROC row-count messages after each
+            # statement, which also keeps multi-statement batches to one
+            # result set per SELECT. Nothing in the app reads cursor.rowcount.
+            raw_conn.execute("SET NOCOUNT ON")
 
             # Wrap the raw connection in our custom connection class
             conn = ConnectionWrapper(raw_conn)
 
-            logging.info(f"Created new database connection at {datetime.now()}")
+            logging.info("Created new database connection")
             return conn
         
         except pyodbc.Error as e:
-            logging.error(f"Failed to create database connection: {str(e)}")
+            logging.error("Failed to create database connection: %s", e)
             raise Exception(f"Connection failed: {str(e)}")
     
     def _initialize_pool(self):
         """Initialize the connection pool with minimum connections"""
+        for _ in range(self.min_connections):
+            try:
+                conn = self._new_connection()
+            except Exception as e:
+                logging.error("Failed to initialize connection pool: %s", e)
+                break
+            if conn is None:
+                break
+            self._pool.put(conn)
+    
+    def _new_connection(self):
+        """Reserve a slot under the lock, then connect outside it
+        
+        Returns None when the pool is already at max_connections.
+        """
         with self._lock:
-            for _ in range(self.min_connections):
-                try:
-                    conn = self._create_connection()
-                    self._pool.put(conn)
-                    self._all_connections.append(conn)
-                    self._created_connections += 1
-                except Exception as e:
-                    logging.error(f"Failed to initialize connection pool: {str(e)}")
-                    break
+            if self._created_connections >= self.max_connections:
+                return None
+            self._created_connections += 1
+        
+        try:
+            conn = self._create_connection()
+        except Exception:
+            with self._lock:
+                self._created_connections -= 1
+            raise
+        
+        with self._lock:
+            self._all_connections[id(conn)] = conn
+        return conn
     
     def get_connection(self, timeout=5):
         """Get a connection from the pool"""
         try:
-            # Try to get an existing connection
-            conn = self._pool.get(timeout=timeout)
-            
-            # Test if connection is still valid
-            if self._is_connection_valid(conn):
-                conn.last_used = datetime.now()
-                return conn
-            else:
-                # Connection is stale, create a new one
-                with self._lock:
-                    if conn in self._all_connections:
-                        self._all_connections.remove(conn)
-                    self._created_connections -= 1
-                return self._get_or_create_connection()
-                
-        except:
-            # Pool is empty, try to create a new connection
-            return self._get_or_create_connection()
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            # Pool is empty, create a new connection or wait for one
+            conn = self._get_or_create_connection(timeout)
+        
+        # Recently used connections are trusted; only idle or failing ones
+        # pay for a round trip to the server
+        if self._is_connection_fresh(conn) or self._ping(conn):
+            conn.last_used = time.monotonic()
+            return conn
+        
+        # Connection is dead, replace it
+        self._discard(conn)
+        return self.get_connection(timeout)
     
-    def _get_or_create_connection(self):
-        """Get existing or create new connection"""
-        with self._lock:
-            if self._created_connections < self.max_connections:
-                try:
-                    conn = self._create_connection()
-                    self._all_connections.append(conn)
-                    self._created_connections += 1
-                    return conn
-                except Exception as e:
-                    logging.error(f"Failed to create new connection: {str(e)}")
-                    raise
-            else:
-                raise Exception("Maximum connections reached")
+    def _get_or_create_connection(self, timeout=5):
+        """Create a new connection, or wait for one to be returned if at the limit"""
+        try:
+            conn = self._new_connection()
+        except Exception as e:
+            logging.error("Failed to create new connection: %s", e)
+            raise
+        if conn is not None:
+            return conn
+        
+        try:
+            return self._pool.get(timeout=timeout)
+        except queue.Empty:
+            raise Exception("Maximum connections reached")
+    
+    def _is_connection_fresh(self, conn):
+        """Cheap local check: used within FRESH_SECONDS and no recorded errors"""
+        return conn.error_count == 0 and time.monotonic() - conn.last_used < self.FRESH_SECONDS
     
-    def _is_connection_valid(self, conn):
-        """Check if a connection is still valid"""
+    def _ping(self, conn):
+        """Check a connection with a SELECT 1 round trip"""
         try:
-            # Check if connection was used recently (within 60 minutes)
-            if hasattr(conn, 'last_used'):
-                if datetime.now() - conn.last_used > timedelta(minutes=60):
-                    return False
-            
-            # Test with a simple query
             cursor = conn.cursor()
             cursor.execute("SELECT 1")
             cursor.fetchone()
             cursor.close()
+            conn.error_count = 0
             return True
         except:
             return False
     
+    def _discard(self, conn):
+        """Drop a connection from the pool's bookkeeping and close it"""
+        with self._lock:
+            if self._all_connections.pop(id(conn), None) is not None:
+                self._created_connections -= 1
+        try:
+            conn.close()
+        except:
+            pass
+    
     def return_connection(self, conn):
         """Return a connection to the pool"""
-        if conn and self._is_connection_valid(conn):
-            try:
-                # Rollback any uncommitted transactions
-                conn.rollback()
-                conn.last_used = datetime.now()
-                self._pool.put_nowait(conn)
-            except:
-                # Pool is full or connection is invalid
-                with self._lock:
-                    if conn in self._all_connections:
-                        self._all_connections.remove(conn)
-                        self._created_connections -= 1
-                try:
-                    conn.close()
-                except:
-                    pass
+        if not conn:
+            return
+        try:
+            # Rollback any uncommitted transactions; a failure here means the
+            # connection is unusable
+            conn.rollback()
+        except pyodbc.Error:
+            self._discard(conn)
+            return
+        conn.last_used = time.monotonic()
+        self._pool.put_nowait(conn)
     
     def close_all(self):
         """Close all connections in the pool"""
         with self._lock:
             # Close all connections in the pool
-            while not self._pool.empty():
+            while True:
                 try:
                     conn = self._pool.get_nowait()
+                except queue.Empty:
+                    break
+                try:
                     conn.close()
                 except:
                     pass
             
             # Close any remaining connections
-            for conn in self._all_connections:
+            for conn in self._all_connections.values():
                 try:
                     conn.close()
                 except:
@@ -216,13 +286,15 @@ class DatabasePool:
 # Global pool instance
 _db_pool = None
 
-def initialize_db_pool():
+def initialize_db_pool(min_connections=5, max_connections=20):
     """Initialize the database connection pool"""
     global _db_pool
     if _db_pool is None:
-        server = "HOTPOINT11-20\\SQLEXPRESS"
-        database = "hotpoint_db"
-        _db_pool = DatabasePool(server, database)
+        _db_pool = DatabasePool(
+            DB_SERVER, DB_NAME,
+            min_connections=min_connections,
+            max_connections=max_connections
+        )
     return _db_pool
 
 def get_db_connection():
@@ -241,20 +313,23 @@ def return_db_connection(conn):
 @contextmanager
 def get_db_context():
     """Context manager for database connections"""
-    conn = None
+    conn = get_db_connection()
     try:
-        conn = get_db_connection()
         yield conn
     except Exception as e:
-        if conn:
-            try:
-                conn.rollback()
-            except:
-                pass
-        raise e
+        if isinstance(e, pyodbc.Error):
+            conn.error_count += 1
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        raise
     finally:
-        if conn:
-            return_db_connection(conn)
+        return_db_connection(conn)
+
+def get_pool_stats():
+    """Statistics for the global pool, or an empty dict before it exists"""
+    return _db_pool.get_pool_stats() if _db_pool else {}
 
 def close_db_pool():
     """Close the database connection pool"""
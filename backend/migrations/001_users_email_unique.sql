@@ -0,0 +1,3 @@
+-- Enforce one account per email so concurrent signups cannot both insert.
+-- signup() maps the resulting constraint violation to a 409.
+CREATE UNIQUE INDEX UX_users_email ON users(email);
@@ -0,0 +1,3 @@
+-- argon2id hashes (~97 chars) do not fit a column sized for bcrypt's 60.
+-- Legacy bcrypt hashes are rewritten as argon2id on the next successful login.
+ALTER TABLE users ALTER COLUMN password_hash NVARCHAR(255) NOT NULL;
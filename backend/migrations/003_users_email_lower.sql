@@ -0,0 +1,6 @@
+-- Case-normalised email for login and signup lookups. The INCLUDE list covers
+-- the login credential SELECT, so it is answered from the index alone.
+ALTER TABLE users ADD email_lower AS LOWER(email) PERSISTED;
+
+CREATE UNIQUE INDEX UX_users_email_lower ON users(email_lower)
+    INCLUDE (password_hash, role, is_active, failed_login_attempts, last_failed_login);
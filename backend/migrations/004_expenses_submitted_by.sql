@@ -0,0 +1,3 @@
+-- Per-user expense statistics on the profile page filter on submitted_by and
+-- aggregate status/amount; this index answers them without touching the table.
+CREATE INDEX IX_expenses_submitted_by ON expenses(submitted_by, status) INCLUDE (amount);
@@ -0,0 +1,8 @@
+-- Expense IDs (EXP0001, ...) come from a sequence instead of COUNT(*) over the
+-- table, which scanned on every insert and gave concurrent creates the same ID.
+-- The sequence starts after the highest ID already issued.
+DECLARE @start BIGINT = ISNULL(
+    (SELECT MAX(TRY_CAST(SUBSTRING(id, 4, 20) AS BIGINT)) FROM expenses WHERE id LIKE 'EXP%'), 0
+) + 1;
+
+EXEC('CREATE SEQUENCE expense_seq AS BIGINT START WITH ' + CAST(@start AS VARCHAR(20)) + ' INCREMENT BY 1 CACHE 50');
@@ -0,0 +1,8 @@
+-- Expense list and report queries filter by location (branch users) and sort
+-- by created_at DESC. The INCLUDE columns let the other list filters be
+-- applied on the index before any row lookups.
+CREATE INDEX IX_expenses_location_created_at ON expenses(location, created_at DESC)
+    INCLUDE (status, category, date);
+
+CREATE INDEX IX_expenses_created_at ON expenses(created_at DESC)
+    INCLUDE (location, status, category, date);
@@ -0,0 +1,11 @@
+-- Keyset pages on the expense list seek on (created_at, id) and sort by
+-- created_at DESC, id DESC. Give the list indexes id as an explicit
+-- descending tiebreaker so the seek and the ORDER BY come straight off the
+-- index, with no sort for rows that share a timestamp.
+CREATE INDEX IX_expenses_location_created_at ON expenses(location, created_at DESC, id DESC)
+    INCLUDE (status, category, date)
+    WITH (DROP_EXISTING = ON);
+
+CREATE INDEX IX_expenses_created_at ON expenses(created_at DESC, id DESC)
+    INCLUDE (location, status, category, date)
+    WITH (DROP_EXISTING = ON);
@@ -0,0 +1,16 @@
+-- Per-branch expense totals for the dashboard, kept up to date by SQL Server
+-- as expenses change. Dashboard reads sum a handful of pre-aggregated rows
+-- instead of grouping the expenses table on every request.
+CREATE VIEW dbo.vw_expense_totals
+WITH SCHEMABINDING
+AS
+SELECT location, category, status,
+       COUNT_BIG(*) AS expense_count,
+       SUM(ISNULL(amount * exchange_rate, 0)) AS kes_total
+FROM dbo.expenses
+GROUP BY location, category, status;
+GO
+
+CREATE UNIQUE CLUSTERED INDEX UX_vw_expense_totals
+    ON dbo.vw_expense_totals(location, status, category);
+GO
@@ -0,0 +1,6 @@
+-- Approver notifications select active admin/finance users plus the branch
+-- managers of one location. A filtered index over active users answers that
+-- with seeks on role (and branch_location for managers); id is the clustered
+-- key, so it is carried in the index without a lookup.
+CREATE INDEX IX_users_approvers ON users(role, branch_location)
+    WHERE is_active = 1;
@@ -0,0 +1,5 @@
+-- Token version per user. Every JWT carries the version it was issued under
+-- and is rejected once logout or a password change bumps it, so revocation is
+-- seen by every worker process, not only the one that handled the logout.
+ALTER TABLE users ADD token_version INT NOT NULL
+    CONSTRAINT DF_users_token_version DEFAULT 0;
@@ -1,16 +1,113 @@
-from flask import Blueprint, request, jsonify, g
-import bcrypt
+from flask import Blueprint, request, g, make_response
+import hashlib
 import logging
-from datetime import datetime, timezone
+import time
+import uuid
+import pyodbc
+from datetime import datetime, timedelta, timezone
 
 from config.database import get_db_context
-from utils.helpers import validate_email, validate_password, safe_datetime_format
-from utils.rbac import create_jwt_token, jwt_required, RBACManager
+from utils.helpers import validate_email, validate_password, safe_datetime_format, MAX_EMAIL_LENGTH
+from utils.rbac import create_jwt_token, jwt_required, invalidate_user_tokens, RBACManager, Role
 from utils.response_handler import APIResponse, handle_exceptions, validate_json_request, ResponseUtils, ResponseCode
 from utils.audit import create_audit_log
+from utils.enhanced_error_handlers import enhance_login_error_handling
+from utils.passwords import (
+    hash_password, check_password, dummy_check_password, needs_rehash, constant_time_equals
+)
+from utils.batch_writer import BatchWriter
+from utils.cache import TTLCache
 
 auth_bp = Blueprint('auth', __name__)
 
+# Login logging/error helpers; stateless, so built once
+_LOGIN_HANDLERS = enhance_login_error_handling()
+
+# Successful logins are batched into one UPDATE every few seconds, keeping
+# only the latest timestamp per user
+_last_login_writer = BatchWriter(
+    'last_login',
+    "UPDATE users SET last_login = ? WHERE id = ?",
+    key=lambda row: row[1]
+)
+# last_login only needs minute precision; fresher values are not rewritten
+LAST_LOGIN_RESOLUTION = timedelta(seconds=60)
+
+# Roles accepted at signup, and the error listing them (in declaration order)
+VALID_ROLES = frozenset(role.value for role in Role)
+INVALID_ROLE_MESSAGE = f"Role must be one of: {', '.join(role.value for role in Role)}"
+
+# Accounts are locked for LOCKOUT_SECONDS after this many consecutive failures
+MAX_FAILED_LOGINS = 5
+LOCKOUT_SECONDS = 1800
+
+# Declared parameter types for the credential lookup. A fixed NVARCHAR(255)
+# for the email keeps one cached plan instead of one per email length; login
+# never sends an email longer than MAX_EMAIL_LENGTH.
+_LOGIN_INPUT_SIZES = [(pyodbc.SQL_INTEGER, 0, 0), (pyodbc.SQL_INTEGER, 0, 0), (pyodbc.SQL_WVARCHAR, 255, 0)]
+
+# Seconds after issue during which /verify trusts the token's profile claim
+PROFILE_CLAIM_MAX_AGE = 900
+
+# Failed attempts are summed per user and written every 200ms, so password
+# guessing bursts cost one UPDATE per account instead of one commit each
+_failed_login_writer = BatchWriter(
+    'failed_login',
+    """
+        UPDATE users 
+        SET failed_login_attempts = ISNULL(failed_login_attempts, 0) + ?,
+            last_failed_login = ?
+        WHERE id = ?
+    """,
+    flush_interval=0.2,
+    key=lambda row: row[2],
+    merge=lambda earlier, later: (earlier[0] + later[0], later[1], later[2])
+)
+
+# Per-user expense statistics shown on the profile page; a few seconds of
+# staleness is fine and saves aggregating the user's expenses on every load
+_profile_stats_cache = TTLCache(ttl=30.0, maxsize=4096)
+
+# Profile columns returned by login, as a SELECT list and as an OUTPUT clause
+_LOGIN_PROFILE_FIELDS = (
+    'first_name', 'last_name', 'email', 'phone', 'department',
+    'branch_location', 'is_verified', 'created_at', 'last_login', 'token_version'
+)
+_LOGIN_PROFILE_COLUMNS = ", ".join(_LOGIN_PROFILE_FIELDS)
+# last_login is rewritten by the same UPDATE, so report the value it replaced
+_LOGIN_PROFILE_OUTPUT = ", ".join(
+    f"DELETED.{c}" if c == 'last_login' else f"INSERTED.{c}" for c in _LOGIN_PROFILE_FIELDS
+)
+
+# Users columns in the row order expected by _user_payload
+_USER_COLUMNS = """id, first_name, last_name, email, phone, role, department,
+                   branch_location, is_verified, is_active, created_at, last_login"""
+
+def _user_payload(row):
+    """Build the API user dict from a row in _USER_COLUMNS order
+    
+    A single constant-key dict display, which CPython builds presized in one
+    step; login, /verify and /profile all go through here.
+    """
+    (user_id, first_name, last_name, email, phone, role, department,
+     branch_location, is_verified, is_active, created_at, last_login) = row
+    return {
+        'id': user_id,
+        'firstName': first_name,
+        'lastName': last_name,
+        'fullName': f"{first_name} {last_name}",
+        'email': email,
+        'phone': phone,
+        'role': role,
+        'department': department,
+        'branchLocation': branch_location,
+        'isVerified': bool(is_verified),
+        'isActive': bool(is_active),
+        'permissions': RBACManager.get_user_permissions(role),
+        'lastLogin': ResponseUtils.format_datetime(last_login),
+        'memberSince': ResponseUtils.format_datetime(created_at)
+    }
+
 @auth_bp.route('/signup', methods=['POST'])
 @validate_json_request(
     required_fields=['firstName', 'lastName', 'email', 'phone', 'password', 'role', 'department', 'branchLocation']
@@ -36,43 +133,52 @@ def signup():
         )
     
     # Validate role
-    valid_roles = ['admin', 'finance', 'branch', 'auditor']
-    if data['role'] not in valid_roles:
+    if data['role'] not in VALID_ROLES:
         return APIResponse.validation_error(
             message="Invalid role",
-            errors=[f"Role must be one of: {', '.join(valid_roles)}"]
+            errors=[INVALID_ROLE_MESSAGE]
         )
     
+    # Stored and compared in normalised form
+    email = data['email'].lower()
+    
+    # Hash password before borrowing a connection so bcrypt doesn't hold one
+    password_hash = hash_password(data['password'])
+    
     with get_db_context() as conn:
         cursor = conn.cursor()
         
-        # Check if user already exists
-        cursor.execute("SELECT id FROM users WHERE email = ?", (data['email'].lower(),))
-        existing_user = cursor.fetchone()
-        
-        if existing_user:
+        # Insert only if the email is free, reading back the new ID in the same
+        # round trip. The unique index on users.email catches concurrent signups.
+        try:
+            cursor.execute("""
+                INSERT INTO users (first_name, last_name, email, phone, password_hash, role, 
+                                 department, branch_location, is_verified, is_active, created_at)
+                OUTPUT INSERTED.id
+                SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
+                WHERE NOT EXISTS (SELECT 1 FROM users WHERE email_lower = ?)
+            """, (
+                data['firstName'], data['lastName'], email, data['phone'],
+                password_hash, data['role'], data['department'], data['branchLocation'],
+                0, 1, datetime.now(timezone.utc),  # is_verified=False, is_active=True
+                email
+            ))
+            inserted = cursor.fetchone()
+        except pyodbc.IntegrityError as e:
+            # Only a duplicate email is a conflict; any other constraint
+            # failure is a real error. Matches UX_users_email and
+            # UX_users_email_lower.
+            if 'UX_users_email' not in str(e):
+                raise
+            inserted = None
+        
+        if not inserted:
             return APIResponse.conflict(
                 message="User already exists",
                 details="An account with this email already exists"
             )
         
-        # Hash password
-        password_hash = bcrypt.hashpw(data['password'].encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-        
-        # Insert new user
-        cursor.execute("""
-            INSERT INTO users (first_name, last_name, email, phone, password_hash, role, 
-                             department, branch_location, is_verified, is_active, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            data['firstName'], data['lastName'], data['email'].lower(), data['phone'],
-            password_hash, data['role'], data['department'], data['branchLocation'],
-            0, 1, datetime.now(timezone.utc)  # is_verified=False, is_active=True
-        ))
-        
-        # Get the new user ID
-        cursor.execute("SELECT @@IDENTITY")
-        user_id = cursor.fetchone()[0]
+        user_id = inserted[0]
         
         conn.commit()
         
@@ -80,7 +186,7 @@ def signup():
         create_audit_log(
             user_id, 'CREATE', 'users', user_id,
             new_values={
-                'email': data['email'].lower(),
+                'email': email,
                 'role': data['role'],
                 'department': data['department'],
                 'branch_location': data['branchLocation']
@@ -92,7 +198,7 @@ def signup():
             'id': int(user_id),
             'firstName': data['firstName'],
             'lastName': data['lastName'],
-            'email': data['email'].lower(),
+            'email': email,
             'phone': data['phone'],
             'role': data['role'],
             'department': data['department'],
@@ -112,119 +218,148 @@ def signup():
 @validate_json_request(required_fields=['email', 'password', 'role'])
 def login():
     """User login endpoint with enhanced error handling"""
-    from utils.enhanced_error_handlers import enhance_login_error_handling
-    
     data = request.get_json()
-    enhanced_handlers = enhance_login_error_handling()
+    now = datetime.now(timezone.utc)
     
-    # Use enhanced logging
-    request_id = str(datetime.now(timezone.utc).timestamp())
-    enhanced_handlers['log_login_attempt'](data.get('email'), data.get('role'), request_id)
+    # Use enhanced logging; a random ID, since timestamps collide under load
+    request_id = uuid.uuid4().hex
+    _LOGIN_HANDLERS['log_login_attempt'](data.get('email'), data.get('role'), request_id)
     
     try:
-        with get_db_context() as conn:
-            cursor = conn.cursor()
-            
-            # Find user with enhanced query
-            cursor.execute("""
-                SELECT id, first_name, last_name, email, phone, password_hash, role, 
-                       department, branch_location, is_verified, is_active, created_at, 
-                       last_login, failed_login_attempts, last_failed_login
-                FROM users WHERE email = ?
-            """, (data['email'].lower(),))
-            
-            user = cursor.fetchone()
-            
-            if not user:
-                logging.warning(f"Login failed: User not found for email={data.get('email')}")
-                return enhanced_handlers['handle_login_error'](
-                    "Invalid email or password", 
-                    request_id
-                )
-
-            (user_id, first_name, last_name, email, phone, password_hash, role, 
-             department, branch_location, is_verified, is_active, created_at, 
-             last_login, failed_attempts, last_failed_login) = user
-            
-            # Check if account is locked
-            max_failed_attempts = 5
-            if failed_attempts >= max_failed_attempts:
-                if last_failed_login:
-                    time_diff = datetime.now(timezone.utc) - last_failed_login
-                    if time_diff.total_seconds() < 1800:  # 30 minutes
-                        return enhanced_handlers['handle_login_error'](
-                            "Account locked", 
-                            request_id
-                        )
-            
-            # Verify password
-            if not bcrypt.checkpw(data['password'].encode('utf-8'), password_hash.encode('utf-8')):
-                # Increment failed login attempts
+        email = data['email'].lower()
+        
+        # An address longer than any valid one would overflow the declared
+        # parameter size; it is treated as unknown without a query
+        user = None
+        if len(email) <= MAX_EMAIL_LENGTH:
+            with get_db_context() as conn:
+                cursor = conn.cursor()
+                
+                # Fetch only what the credential checks need; profile columns are
+                # read once they pass, so failed attempts stay cheap
+                cursor.setinputsizes(_LOGIN_INPUT_SIZES)
                 cursor.execute("""
-                    UPDATE users 
-                    SET failed_login_attempts = ISNULL(failed_login_attempts, 0) + 1,
-                        last_failed_login = ?
-                    WHERE id = ?
-                """, (datetime.now(timezone.utc), user_id))
-                conn.commit()
+                    SELECT id, password_hash, role, is_active, 
+                           ISNULL(failed_login_attempts, 0),
+                           CASE WHEN failed_login_attempts >= ?
+                                 AND DATEDIFF(SECOND, last_failed_login, SYSUTCDATETIME()) < ?
+                                THEN 1 ELSE 0 END
+                    FROM users WHERE email_lower = ?
+                """, (MAX_FAILED_LOGINS, LOCKOUT_SECONDS, email))
                 
-                return enhanced_handlers['handle_login_error'](
-                    "Invalid email or password", 
-                    request_id
-                )
-            
-            # Check if user is active
-            if not is_active:
-                return enhanced_handlers['handle_login_error'](
-                    "Account disabled", 
-                    request_id
-                )
+                user = cursor.fetchone()
+        
+        if not user:
+            # Same hashing cost as a wrong password so response timing
+            # does not reveal whether the email is registered
+            dummy_check_password(data['password'])
+            logging.warning("Login failed: User not found for email=%s", data.get('email'))
+            return _LOGIN_HANDLERS['handle_login_error'](
+                "Invalid email or password", 
+                request_id
+            )
+
+        user_id, password_hash, role, is_active, failed_attempts, is_locked = user
+        
+        # Lockout window is evaluated by the database against its own clock
+        if is_locked:
+            return _LOGIN_HANDLERS['handle_login_error'](
+                "Account locked", 
+                request_id
+            )
+        
+        # Verify password and role together; both run every time and a
+        # wrong role gets the same answer as a wrong password. No pooled
+        # connection is held here, since the hash check is deliberately slow.
+        password_ok = check_password(data['password'], password_hash)
+        credentials_ok = password_ok & constant_time_equals(role, data['role'])
+        if not credentials_ok:
+            if not password_ok:
+                # Counted in the background; a burst of failures becomes
+                # one increment per account per flush
+                _failed_login_writer.submit((1, now, user_id))
             
-            # Verify role matches
-            if role != data['role']:
-                return enhanced_handlers['handle_login_error'](
-                    "Role mismatch", 
-                    request_id
-                )
+            return _LOGIN_HANDLERS['handle_login_error'](
+                "Invalid email or password", 
+                request_id
+            )
+        
+        # Check if user is active
+        if not is_active:
+            return _LOGIN_HANDLERS['handle_login_error'](
+                "Account disabled", 
+                request_id
+            )
         
+        # Failures still waiting to be counted must not land after the reset
+        _failed_login_writer.discard(user_id)
+        
+        # Writes needed on a successful login; most logins need none
+        updates = []
+        params = []
+        # Upgrade legacy bcrypt hashes to argon2id now that we have the
+        # plaintext; happens once per account
+        if needs_rehash(password_hash):
+            updates.append("password_hash = ?")
+            params.append(hash_password(data['password']))
         # Reset failed login attempts on successful login
-        cursor.execute("""
-            UPDATE users 
-            SET last_login = ?, failed_login_attempts = 0, last_failed_login = NULL
-            WHERE id = ?
-        """, (datetime.now(timezone.utc), user_id))
-        conn.commit()
+        if failed_attempts:
+            updates.append("failed_login_attempts = 0, last_failed_login = NULL")
+        
+        with get_db_context() as conn:
+            cursor = conn.cursor()
             
-        # Create JWT token with enhanced payload
-        token = create_jwt_token(user_id)
+            # Read the profile in the same round trip as any pending write,
+            # which also records last_login. The hash predicate skips the
+            # write if the password changed meanwhile.
+            if updates:
+                cursor.execute(
+                    f"UPDATE users SET {', '.join(updates)}, last_login = ? "
+                    f"OUTPUT {_LOGIN_PROFILE_OUTPUT} WHERE id = ? AND password_hash = ?",
+                    (*params, now, user_id, password_hash)
+                )
+                profile = cursor.fetchone()
+                conn.commit()
+            else:
+                cursor.execute(f"SELECT {_LOGIN_PROFILE_COLUMNS} FROM users WHERE id = ?", (user_id,))
+                profile = cursor.fetchone()
+        
+        if not profile:
+            return _LOGIN_HANDLERS['handle_login_error'](
+                "Invalid email or password", 
+                request_id
+            )
+        
+        (first_name, last_name, email, phone, department, 
+         branch_location, is_verified, created_at, last_login, token_version) = profile
+        
+        # last_login is informational, so when nothing else needed writing
+        # it is written in the background, and only if it has gone stale.
+        # Stored timestamps are UTC.
+        if not updates and (
+            last_login is None
+            or now - last_login.replace(tzinfo=timezone.utc) >= LAST_LOGIN_RESOLUTION
+        ):
+            _last_login_writer.submit((now, user_id))
+        
+        # Prepare user data for response
+        user_data = _user_payload((
+            user_id, first_name, last_name, email, phone, role, department,
+            branch_location, is_verified, is_active, created_at, last_login
+        ))
+        
+        # Create JWT token carrying the profile so /verify needs no DB read
+        token = create_jwt_token(user_data, now, token_version)
         if not token:
             return APIResponse.error(
                 message="Failed to generate authentication token",
-                code=APIResponse.ResponseCode.INTERNAL_SERVER_ERROR
+                code=ResponseCode.INTERNAL_SERVER_ERROR
             )
         
-        # Prepare user data for response
-        user_data = {
-            'id': user_id,
-            'firstName': first_name,
-            'lastName': last_name,
-            'fullName': f"{first_name} {last_name}",
-            'email': email,
-            'phone': phone,
-            'role': role,
-            'department': department,
-            'branchLocation': branch_location,
-            'isVerified': bool(is_verified),
-            'isActive': bool(is_active),
-            'permissions': RBACManager.get_user_permissions(role),
-            'lastLogin': ResponseUtils.format_datetime(last_login),
-            'memberSince': ResponseUtils.format_datetime(created_at)
-        }
-        
         # Create audit log for login
         create_audit_log(
             user_id, 'LOGIN', 'users', user_id,
-            new_values={'login_time': datetime.now(timezone.utc).isoformat()}
+            new_values={'login_time': now}, now=now
         )
         
         return APIResponse.success(
@@ -248,11 +383,20 @@ def login():
 def logout():
     """User logout endpoint"""
     user_id = g.current_user['id']
+    now = datetime.now(timezone.utc)
+    
+    # Revoke the user's tokens on every worker; this one also forgets its
+    # cached verifications straight away
+    with get_db_context() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE users SET token_version = token_version + 1 WHERE id = ?", (user_id,))
+        conn.commit()
+    invalidate_user_tokens(user_id)
     
     # Create audit log for logout
     create_audit_log(
         user_id, 'LOGOUT', 'users', user_id,
-        new_values={'logout_time': datetime.now(timezone.utc).isoformat()}
+        new_values={'logout_time': now}, now=now
     )
     
     return APIResponse.success(message="Logout successful")
@@ -262,46 +406,50 @@ def logout():
 @handle_exceptions
 def verify_token():
     """Verify JWT token and return user info"""
-    user_id = g.current_user['id']
+    profile = g.current_user.get('profile')
+    issued_at = g.current_user.get('iat') or 0
+    
+    # Profile claims are served as-is while recent; older tokens re-read the
+    # row so profile edits show up without waiting for the token to expire
+    if profile and time.time() - issued_at <= PROFILE_CLAIM_MAX_AGE:
+        # Profile claims are fixed for the token's lifetime, so its ID is a stable ETag
+        etag = g.current_user['jti']
+        if etag in request.if_none_match:
+            return APIResponse.not_modified(etag)
+        
+        user_data = dict(profile, permissions=g.current_user['permissions'])
+    else:
+        # Stale claims, and tokens issued before profile claims existed, are
+        # rebuilt from the users table
+        user_data = _load_user_data(g.current_user['id'])
+        if not user_data:
+            return APIResponse.unauthorized("Token is invalid or user is inactive")
+        etag = hashlib.sha1(repr(sorted(user_data.items())).encode('utf-8')).hexdigest()
+        if etag in request.if_none_match:
+            return APIResponse.not_modified(etag)
     
+    response = make_response(APIResponse.success(
+        data={'user': user_data},
+        message="Token is valid"
+    ))
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def _load_user_data(user_id):
+    """Read an active user's response dict from the database"""
     with get_db_context() as conn:
         cursor = conn.cursor()
         
-        cursor.execute("""
-            SELECT id, first_name, last_name, email, phone, role, department, 
-                   branch_location, is_verified, is_active, created_at, last_login
-            FROM users WHERE id = ?
-        """, (user_id,))
+        cursor.execute(f"SELECT {_USER_COLUMNS} FROM users WHERE id = ?", (user_id,))
         
         user = cursor.fetchone()
-        
-        if not user or not user[9]:  # is_active check
-            return APIResponse.unauthorized("Token is invalid or user is inactive")
-        
-        (user_id, first_name, last_name, email, phone, role, department, 
-         branch_location, is_verified, is_active, created_at, last_login) = user
-        
-        user_data = {
-            'id': user_id,
-            'firstName': first_name,
-            'lastName': last_name,
-            'fullName': f"{first_name} {last_name}",
-            'email': email,
-            'phone': phone,
-            'role': role,
-            'department': department,
-            'branchLocation': branch_location,
-            'isVerified': bool(is_verified),
-            'isActive': bool(is_active),
-            'permissions': RBACManager.get_user_permissions(role),
-            'lastLogin': ResponseUtils.format_datetime(last_login),
-            'memberSince': ResponseUtils.format_datetime(created_at)
-        }
-        
-        return APIResponse.success(
-            data={'user': user_data},
-            message="Token is valid"
-        )
+    
+    if not user or not user[9]:  # is_active check
+        return None
+    
+    return _user_payload(user)
 
 @auth_bp.route('/profile', methods=['GET'])
 @jwt_required
@@ -310,58 +458,51 @@ def get_profile():
     """Get current user's profile"""
     user_id = g.current_user['id']
     
+    statistics = _profile_stats_cache.get(user_id)
+    
     with get_db_context() as conn:
         cursor = conn.cursor()
         
-        # Get user profile with additional stats
-        cursor.execute("""
-            SELECT u.id, u.first_name, u.last_name, u.email, u.phone, u.role, 
-                   u.department, u.branch_location, u.is_verified, u.is_active, 
-                   u.created_at, u.last_login,
-                   COUNT(DISTINCT e.id) as total_expenses,
-                   COALESCE(SUM(CASE WHEN e.status = 'approved' THEN e.amount ELSE 0 END), 0) as approved_amount,
-                   COUNT(DISTINCT CASE WHEN e.status = 'pending' THEN e.id END) as pending_expenses
-            FROM users u
-            LEFT JOIN expenses e ON u.id = e.submitted_by
-            WHERE u.id = ?
-            GROUP BY u.id, u.first_name, u.last_name, u.email, u.phone, u.role, 
-                     u.department, u.branch_location, u.is_verified, u.is_active, 
-                     u.created_at, u.last_login
-        """, (user_id,))
+        # User row by primary key; the expense aggregate rides in the same
+        # batch only when it is not cached
+        user_sql = f"SELECT {_USER_COLUMNS} FROM users WHERE id = ?"
+        if statistics is None:
+            cursor.execute(user_sql + """;
+                SELECT COUNT(*),
+                       COALESCE(SUM(CASE WHEN status = 'approved' THEN amount ELSE 0 END), 0),
+                       COUNT(CASE WHEN status = 'pending' THEN 1 END)
+                FROM expenses WHERE submitted_by = ?
+            """, (user_id, user_id))
+        else:
+            cursor.execute(user_sql, (user_id,))
         
         user = cursor.fetchone()
         
-        if not user:
-            return APIResponse.not_found("User profile")
-        
-        profile_data = {
-            'user': {
-                'id': user[0],
-                'firstName': user[1],
-                'lastName': user[2],
-                'fullName': f"{user[1]} {user[2]}",
-                'email': user[3],
-                'phone': user[4],
-                'role': user[5],
-                'department': user[6],
-                'branchLocation': user[7],
-                'isVerified': bool(user[8]),
-                'isActive': bool(user[9]),
-                'permissions': RBACManager.get_user_permissions(user[5]),
-                'memberSince': ResponseUtils.format_datetime(user[10]),
-                'lastLogin': ResponseUtils.format_datetime(user[11])
-            },
-            'statistics': {
-                'totalExpenses': user[12],
-                'approvedAmount': ResponseUtils.format_currency(user[13]),
-                'pendingExpenses': user[14]
-            }
-        }
-        
-        return APIResponse.success(
-            data=profile_data,
-            message="Profile retrieved successfully"
-        )
+        if statistics is None:
+            # Read the aggregate even without a user row, so no result set is
+            # left pending when the connection goes back to the pool
+            cursor.nextset()
+            total_expenses, approved_amount, pending_expenses = cursor.fetchone()
+            if user:
+                statistics = {
+                    'totalExpenses': total_expenses,
+                    'approvedAmount': ResponseUtils.format_currency(approved_amount),
+                    'pendingExpenses': pending_expenses
+                }
+                _profile_stats_cache.set(user_id, statistics)
+    
+    if not user:
+        return APIResponse.not_found("User profile")
+    
+    profile_data = {
+        'user': _user_payload(user),
+        'statistics': statistics
+    }
+    
+    return APIResponse.success(
+        data=profile_data,
+        message="Profile retrieved successfully"
+    )
 
 @auth_bp.route('/change-password', methods=['POST'])
 @jwt_required
@@ -386,30 +527,50 @@ def change_password():
         # Get current password hash
         cursor.execute("SELECT password_hash FROM users WHERE id = ?", (user_id,))
         user = cursor.fetchone()
+    
+    if not user:
+        return APIResponse.not_found("User")
+    
+    # Verify and hash without holding a pooled connection; both are
+    # deliberately slow
+    current_hash = user[0]
+    if not check_password(data['currentPassword'], current_hash):
+        return APIResponse.unauthorized("Current password is incorrect")
+    
+    new_password_hash = hash_password(data['newPassword'])
+    now = datetime.now(timezone.utc)
+    
+    with get_db_context() as conn:
+        cursor = conn.cursor()
         
-        if not user:
-            return APIResponse.not_found("User")
-        
-        # Verify current password
-        if not bcrypt.checkpw(data['currentPassword'].encode('utf-8'), user[0].encode('utf-8')):
-            return APIResponse.unauthorized("Current password is incorrect")
-        
-        # Hash new password
-        new_password_hash = bcrypt.hashpw(data['newPassword'].encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-        
-        # Update password
+        # Update password, only if it was not changed since it was verified,
+        # and revoke every token issued under the old one
         cursor.execute("""
             UPDATE users 
-            SET password_hash = ?, updated_at = ?
-            WHERE id = ?
-        """, (new_password_hash, datetime.now(timezone.utc), user_id))
-        
+            SET password_hash = ?, updated_at = ?, token_version = token_version + 1
+            OUTPUT INSERTED.token_version
+            WHERE id = ? AND password_hash = ?
+        """, (new_password_hash, now, user_id, current_hash))
+        updated = cursor.fetchone()
         conn.commit()
-        
-        # Create audit log
-        create_audit_log(
-            user_id, 'UPDATE', 'users', user_id,
-            new_values={'action': 'password_changed'}
-        )
-        
-        return APIResponse.success(message="Password changed successfully")
\ No newline at end of file
+    
+    if not updated:
+        return APIResponse.conflict(message="Password was changed by another request")
+    
+    # Drop this worker's cached verifications of the revoked tokens
+    invalidate_user_tokens(user_id)
+    
+    # The caller's own token was revoked too, so hand back a replacement
+    profile = g.current_user.get('profile')
+    token = create_jwt_token(profile, now, updated[0]) if profile else None
+    
+    # Create audit log
+    create_audit_log(
+        user_id, 'UPDATE', 'users', user_id,
+        new_values={'action': 'password_changed'}, now=now
+    )
+    
+    return APIResponse.success(
+        data={'token': token} if token else None,
+        message="Password changed successfully"
+    )
\ No newline at end of file
@@ -1,4 +1,6 @@
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, request, g
+import base64
+import binascii
 import logging
 import os
 import uuid
@@ -6,13 +8,112 @@ from datetime import datetime, timezone
 from werkzeug.utils import secure_filename
 
 from config.database import get_db_context
-from utils.helpers import safe_datetime_format, decimal_to_float, allowed_file
+from utils.helpers import safe_datetime_format, decimal_to_float, allowed_file, save_upload
 from utils.rbac import jwt_required, require_permission, can_access_branch_data, Permission
-from utils.response_handler import APIResponse, handle_exceptions, validate_json_request, ResponseUtils
+from utils.response_handler import APIResponse, handle_exceptions, validate_json_request, ResponseUtils, ResponseCode
 from utils.audit import create_audit_log
+from utils.cache import TTLCache
 
 expense_bp = Blueprint('expenses', __name__)
 
+# Expense columns in the order the list and detail handlers index them.
+# Spelled out rather than e.* so added columns can't shift the positions.
+_EXPENSE_COLUMNS = """e.id, e.date, e.description, e.category, e.amount, e.float_id, e.location,
+                   e.status, e.currency, e.exchange_rate, e.receipt_filename, e.submitted_by,
+                   e.approved_by, e.approved_at, e.rejection_reason, e.policy_violation,
+                   e.violation_reason, e.created_at, e.updated_at"""
+
+# Form fields create_expense requires, in the order they are reported
+_EXPENSE_REQUIRED_FIELDS = ('date', 'description', 'category', 'amount', 'floatId', 'location')
+_EXPENSE_REQUIRED_SET = frozenset(_EXPENSE_REQUIRED_FIELDS)
+
+# Statement text is built once so every request sends the same string and
+# hits SQL Server's cached plan; nothing is formatted per call
+_SQL_EXPENSE_LIST_SELECT = f"""
+    SELECT {_EXPENSE_COLUMNS},
+           u1.first_name + ' ' + u1.last_name as submitted_by_name,
+           u2.first_name + ' ' + u2.last_name as approved_by_name,
+           f.description as float_description
+"""
+
+# Page-number mode also reports the filtered total, computed by the same scan
+_SQL_EXPENSE_PAGE_SELECT = _SQL_EXPENSE_LIST_SELECT.rstrip() + """,
+           COUNT(*) OVER () as total_rows
+"""
+
+_SQL_EXPENSE_DETAIL = f"""
+    SELECT {_EXPENSE_COLUMNS},
+           u1.first_name + ' ' + u1.last_name as submitted_by_name,
+           u1.email as submitted_by_email,
+           u2.first_name + ' ' + u2.last_name as approved_by_name,
+           u2.email as approved_by_email,
+           f.description as float_description,
+           f.balance as float_balance
+    FROM expenses e
+    LEFT JOIN users u1 ON e.submitted_by = u1.id
+    LEFT JOIN users u2 ON e.approved_by = u2.id
+    LEFT JOIN floats f ON e.float_id = f.id
+    WHERE e.id = ?
+"""
+
+# Everything create_expense must know before inserting, in one round trip:
+# whether the float is usable and the category's limit, then the next ID.
+# NEXT VALUE FOR may not share a statement with subqueries, so it is a
+# second statement in the same batch.
+_SQL_EXPENSE_PRECHECK = """
+    SELECT (SELECT 1 FROM floats WHERE id = ? AND is_active = 1),
+           (SELECT TOP 1 amount_limit FROM policies WHERE category = ? AND is_active = 1);
+    SELECT NEXT VALUE FOR expense_seq;
+"""
+
+# The same without the policy lookup, for when the limit is cached
+_SQL_EXPENSE_PRECHECK_NO_POLICY = """
+    SELECT (SELECT 1 FROM floats WHERE id = ? AND is_active = 1);
+    SELECT NEXT VALUE FOR expense_seq;
+"""
+
+# Policy limits are reference data that rarely change; a limit is reused for
+# up to POLICY_LIMIT_TTL seconds. Categories without a limit are not cached,
+# so a newly added policy applies immediately.
+POLICY_LIMIT_TTL = 60.0
+_policy_limit_cache = TTLCache(ttl=POLICY_LIMIT_TTL, maxsize=256)
+
+_SQL_INSERT_EXPENSE = """
+    INSERT INTO expenses (id, date, description, category, amount, float_id, location, status, 
+                        currency, exchange_rate, receipt_filename, submitted_by, approved_by, 
+                        approved_at, policy_violation, violation_reason, created_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_SQL_INSERT_ATTACHMENT = """
+    INSERT INTO expense_attachments (expense_id, filename, original_filename, 
+                                   file_type, file_size, upload_path)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+# One set-based insert for every eligible approver
+_SQL_NOTIFY_APPROVERS = """
+    INSERT INTO notifications (user_id, title, message, type, related_id)
+    SELECT id, ?, ?, ?, ?
+    FROM users 
+    WHERE role IN ('admin', 'finance', 'branch') 
+    AND (role != 'branch' OR branch_location = ?) 
+    AND is_active = 1
+    AND id != ?
+"""
+
+def _encode_cursor(created_at, expense_id):
+    """Opaque keyset cursor for the row a page ended on"""
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{expense_id}".encode('utf-8')).decode('ascii')
+
+def _decode_cursor(cursor_value):
+    """Return (created_at, expense_id) from a cursor, or None if it is malformed"""
+    try:
+        created_at, expense_id = base64.urlsafe_b64decode(cursor_value.encode('ascii')).decode('utf-8').split('|', 1)
+        return datetime.fromisoformat(created_at), expense_id
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+
 @expense_bp.route('', methods=['GET'])
 @jwt_required
 @require_permission(Permission.VIEW_EXPENSES)
@@ -20,7 +121,22 @@ expense_bp = Blueprint('expenses', __name__)
 def get_expenses():
     """Get expenses based on user role and permissions"""
     page = request.args.get('page', 1, type=int)
-    per_page = min(request.args.get('per_page', 50, type=int), 100)
+    per_page = request.args.get('per_page', 50, type=int)
+    # Keyset mode: present (even empty) ``cursor`` pages by (created_at, id)
+    # instead of OFFSET, so deep pages cost the same as the first
+    cursor_arg = request.args.get('cursor')
+    if cursor_arg is not None:
+        per_page = request.args.get('limit', per_page, type=int)
+    if page < 1 or per_page < 1:
+        return APIResponse.validation_error(
+            message="Invalid pagination parameters",
+            errors=["page, per_page and limit must be positive integers"]
+        )
+    per_page = max(1, min(per_page, 100))
+    if cursor_arg is not None:
+        after = _decode_cursor(cursor_arg) if cursor_arg else None
+        if cursor_arg and after is None:
+            return APIResponse.validation_error(message="Invalid cursor")
     status_filter = request.args.get('status')
     category_filter = request.args.get('category')
     location_filter = request.args.get('location')
@@ -71,27 +187,39 @@ def get_expenses():
             base_query += " AND e.date <= ?"
             params.append(date_to)
         
-        # Get total count for pagination
-        count_query = "SELECT COUNT(*) " + base_query
-        cursor.execute(count_query, params)
-        total = cursor.fetchone()[0]
-        
-        # Get paginated data
-        data_query = """
-            SELECT e.id, e.date, e.description, e.category, e.amount, e.float_id, e.location,
-                   e.status, e.currency, e.exchange_rate, e.receipt_filename, e.submitted_by,
-                   e.approved_by, e.approved_at, e.rejection_reason, e.policy_violation,
-                   e.violation_reason, e.created_at, e.updated_at,
-                   u1.first_name + ' ' + u1.last_name as submitted_by_name,
-                   u2.first_name + ' ' + u2.last_name as approved_by_name,
-                   f.description as float_description
-        """ + base_query + " ORDER BY e.created_at DESC OFFSET ? ROWS FETCH NEXT ? ROWS ONLY"
-        
-        offset = (page - 1) * per_page
-        cursor.execute(data_query, params + [offset, per_page])
-        
+        if cursor_arg is not None:
+            if after:
+                base_query += " AND (e.created_at < ? OR (e.created_at = ? AND e.id < ?))"
+                params.extend((after[0], after[0], after[1]))
+            # One extra row tells us whether another page exists, without a COUNT
+            cursor.execute(
+                _SQL_EXPENSE_LIST_SELECT + base_query + " ORDER BY e.created_at DESC, e.id DESC OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY",
+                params + [per_page + 1]
+            )
+            rows = cursor.fetchall()
+            has_next = len(rows) > per_page
+            rows = rows[:per_page]
+        else:
+            # Page and total in one statement; every row carries the total
+            data_query = _SQL_EXPENSE_PAGE_SELECT + base_query + " ORDER BY e.created_at DESC, e.id DESC OFFSET ? ROWS FETCH NEXT ? ROWS ONLY"
+            
+            offset = (page - 1) * per_page
+            cursor.execute(data_query, params + [offset, per_page])
+            rows = cursor.fetchall()
+            
+            if rows:
+                total = rows[0][-1]
+            elif offset:
+                # Past the last page there is no row to read it from
+                cursor.execute("SELECT COUNT(*) " + base_query, params)
+                total = cursor.fetchval()
+            else:
+                total = 0
+        
+        # Datetime columns are passed through; the response encoder writes them
+        # as ISO-8601 UTC with a trailing Z
         expenses = []
-        for row in cursor.fetchall():
+        for row in rows:
             expense_data = {
                 'id': row[0],
                 'date': ResponseUtils.format_datetime(row[1]),
@@ -111,15 +239,15 @@ def get_expenses():
                     'id': row[12],
                     'name': row[20]
                 } if row[12] else None,
-                'approvedAt': ResponseUtils.format_datetime(row[13]),
+                'approvedAt': row[13],
                 'rejectionReason': row[14],
                 'policyViolation': {
                     'hasViolation': bool(row[15]),
                     'reason': row[16]
                 },
                 'timestamps': {
-                    'createdAt': ResponseUtils.format_datetime(row[17]),
-                    'updatedAt': ResponseUtils.format_datetime(row[18])
+                    'createdAt': row[17],
+                    'updatedAt': row[18]
                 },
                 'float': {
                     'id': row[5],
@@ -128,6 +256,15 @@ def get_expenses():
             }
             expenses.append(expense_data)
         
+        if cursor_arg is not None:
+            last = rows[-1] if rows else None
+            return APIResponse.cursor_paginated_success(
+                data=expenses,
+                next_cursor=_encode_cursor(last[17], last[0]) if has_next else None,
+                per_page=per_page,
+                message=f"Retrieved {len(expenses)} expenses"
+            )
+        
         return APIResponse.paginated_success(
             data=expenses,
             total=total,
@@ -143,175 +280,175 @@ def get_expenses():
 def create_expense():
     """Create a new expense"""
     # Handle multipart form data
-    data = {}
-    for key in request.form:
-        data[key] = request.form[key]
+    data = request.form.to_dict()
     
-    # Validate required fields
-    required_fields = ['date', 'description', 'category', 'amount', 'floatId', 'location']
-    missing_fields = [field for field in required_fields if not data.get(field)]
-    
-    if missing_fields:
+    # Validate required fields; the ordered list is only built on failure
+    if not _EXPENSE_REQUIRED_SET.issubset(key for key, value in data.items() if value):
+        missing_fields = [field for field in _EXPENSE_REQUIRED_FIELDS if not data.get(field)]
         return APIResponse.validation_error(
             message="Missing required fields",
             errors=[f"Missing fields: {', '.join(missing_fields)}"]
         )
     
+    user_role = g.current_user['role']
+    user_id = g.current_user['id']
+    
+    # Validate branch access for branch managers
+    if user_role == 'branch' and not can_access_branch_data(data['location']):
+        return APIResponse.forbidden("Cannot create expenses for other branches")
+    
+    try:
+        amount = float(data['amount'])
+        exchange_rate = float(data.get('exchangeRate', 1))
+    except ValueError:
+        return APIResponse.validation_error(
+            message="Invalid numeric values",
+            errors=["Amount and exchange rate must be valid numbers"]
+        )
+    
+    kes_amount = amount * exchange_rate
+    
     with get_db_context() as conn:
         cursor = conn.cursor()
         
-        user_role = g.current_user['role']
-        user_id = g.current_user['id']
-        
-        # Validate branch access for branch managers
-        if user_role == 'branch' and not can_access_branch_data(data['location']):
-            return APIResponse.forbidden("Cannot create expenses for other branches")
-        
-        # Check if float exists and has sufficient balance
-        cursor.execute("SELECT balance FROM floats WHERE id = ? AND is_active = 1", (data['floatId'],))
-        float_info = cursor.fetchone()
-        
-        if not float_info:
-            return APIResponse.not_found("Float", data['floatId'])
-        
-        try:
-            amount = float(data['amount'])
-            exchange_rate = float(data.get('exchangeRate', 1))
-        except ValueError:
-            return APIResponse.validation_error(
-                message="Invalid numeric values",
-                errors=["Amount and exchange rate must be valid numbers"]
-            )
-        
-        kes_amount = amount * exchange_rate
-        
-        # Check policy violations
-        cursor.execute("""
-            SELECT amount_limit FROM policies 
-            WHERE category = ? AND is_active = 1
-        """, (data['category'],))
-        policy = cursor.fetchone()
-        
-        policy_violation = False
-        violation_reason = None
-        
-        if policy and policy[0] and kes_amount > float(policy[0]):
-            policy_violation = True
-            violation_reason = f"Exceeds policy limit of {policy[0]} for {data['category']}"
-        
-        # Generate expense ID
-        cursor.execute("SELECT COUNT(*) FROM expenses")
-        count = cursor.fetchone()[0] + 1
-        expense_id = f"EXP{count:04d}"
-        
-        # Handle file uploads
-        receipt_filename = None
-        if 'receipt' in request.files:
-            receipt_file = request.files['receipt']
-            if receipt_file and allowed_file(receipt_file.filename):
-                filename = secure_filename(receipt_file.filename)
-                unique_filename = f"{expense_id}_{uuid.uuid4().hex}_{filename}"
-                receipt_path = os.path.join('uploads', unique_filename)
-                receipt_file.save(receipt_path)
-                receipt_filename = unique_filename
-        
-        # Determine initial status based on role and policy violations
-        if user_role == 'admin':
-            status = 'approved'
-            approved_by = user_id
-            approved_at = datetime.now(timezone.utc)
-        elif policy_violation and user_role != 'admin':
-            status = 'pending'  # Policy violations require higher approval
-            approved_by = None
-            approved_at = None
+        # Float, policy limit and expense ID in a single batch. The sequence
+        # is atomic, so concurrent creates never share a number; one drawn
+        # for a rejected request is simply skipped.
+        policy_limit = _policy_limit_cache.get(data['category'])
+        if policy_limit is None:
+            cursor.execute(_SQL_EXPENSE_PRECHECK, (data['floatId'], data['category']))
+            float_exists, policy_limit = cursor.fetchone()
+            if policy_limit is not None:
+                _policy_limit_cache.set(data['category'], policy_limit)
         else:
-            status = 'pending'
-            approved_by = None
-            approved_at = None
-        
-        # Insert expense
-        cursor.execute("""
-            INSERT INTO expenses (id, date, description, category, amount, float_id, location, status, 
-                                currency, exchange_rate, receipt_filename, submitted_by, approved_by, 
-                                approved_at, policy_violation, violation_reason, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            expense_id, data['date'], data['description'], data['category'], amount,
-            data['floatId'], data['location'], status, data.get('currency', 'KES'),
-            exchange_rate, receipt_filename, user_id, approved_by, approved_at,
-            policy_violation, violation_reason, datetime.now(timezone.utc), datetime.now(timezone.utc)
-        ))
-        
-        # Handle additional attachments
-        attachment_count = 0
-        if 'attachments' in request.files:
-            attachments = request.files.getlist('attachments')
-            for attachment in attachments:
-                if attachment and allowed_file(attachment.filename):
-                    filename = secure_filename(attachment.filename)
-                    unique_filename = f"{expense_id}_{uuid.uuid4().hex}_{filename}"
-                    attachment_path = os.path.join('uploads', unique_filename)
-                    attachment.save(attachment_path)
-                    
-                    cursor.execute("""
-                        INSERT INTO expense_attachments (expense_id, filename, original_filename, 
-                                                       file_type, file_size, upload_path)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    """, (
-                        expense_id, unique_filename, attachment.filename,
-                        attachment.content_type or 'application/octet-stream',
-                        os.path.getsize(attachment_path), attachment_path
-                    ))
-                    attachment_count += 1
-        
-        conn.commit()
-        
-        # Create audit log
-        create_audit_log(user_id, 'CREATE', 'expenses', expense_id, new_values=data)
-        
-        # Create notifications for approvers if not auto-approved
-        if status == 'pending':
-            cursor.execute("""
-                SELECT id FROM users 
-                WHERE role IN ('admin', 'finance', 'branch') 
-                AND (role != 'branch' OR branch_location = ?) 
-                AND is_active = 1
-                AND id != ?
-            """, (data['location'], user_id))
+            cursor.execute(_SQL_EXPENSE_PRECHECK_NO_POLICY, (data['floatId'],))
+            float_exists = cursor.fetchone()[0]
+        cursor.nextset()
+        expense_number = cursor.fetchval()
+    
+    if not float_exists:
+        return APIResponse.not_found("Float", data['floatId'])
+    
+    # Check policy violations
+    policy_violation = False
+    violation_reason = None
+    
+    if policy_limit and kes_amount > float(policy_limit):
+        policy_violation = True
+        violation_reason = f"Exceeds policy limit of {policy_limit} for {data['category']}"
+    
+    expense_id = f"EXP{expense_number:04d}"
+    
+    # Files are written before the write transaction starts, with no pooled
+    # connection held, so slow disks never stretch the transaction
+    saved_paths = []
+    
+    # Handle file uploads
+    receipt_filename = None
+    if 'receipt' in request.files:
+        receipt_file = request.files['receipt']
+        if receipt_file and allowed_file(receipt_file.filename):
+            filename = secure_filename(receipt_file.filename)
+            unique_filename = f"{expense_id}_{uuid.uuid4().hex}_{filename}"
+            receipt_path = os.path.join('uploads', unique_filename)
+            save_upload(receipt_file, receipt_path)
+            saved_paths.append(receipt_path)
+            receipt_filename = unique_filename
+    
+    # Handle additional attachments; the rows are inserted as one batch
+    attachment_rows = []
+    if 'attachments' in request.files:
+        attachments = request.files.getlist('attachments')
+        for attachment in attachments:
+            if attachment and allowed_file(attachment.filename):
+                filename = secure_filename(attachment.filename)
+                unique_filename = f"{expense_id}_{uuid.uuid4().hex}_{filename}"
+                attachment_path = os.path.join('uploads', unique_filename)
+                attachment_size = save_upload(attachment, attachment_path)
+                saved_paths.append(attachment_path)
+                
+                attachment_rows.append((
+                    expense_id, unique_filename, attachment.filename,
+                    attachment.content_type or 'application/octet-stream',
+                    attachment_size, attachment_path
+                ))
+    attachment_count = len(attachment_rows)
+    
+    now = datetime.now(timezone.utc)
+    
+    # Determine initial status based on role and policy violations
+    if user_role == 'admin':
+        status = 'approved'
+        approved_by = user_id
+        approved_at = now
+    elif policy_violation and user_role != 'admin':
+        status = 'pending'  # Policy violations require higher approval
+        approved_by = None
+        approved_at = None
+    else:
+        status = 'pending'
+        approved_by = None
+        approved_at = None
+    
+    try:
+        with get_db_context() as conn:
+            cursor = conn.cursor()
+            
+            # Insert expense
+            cursor.execute(_SQL_INSERT_EXPENSE, (
+                expense_id, data['date'], data['description'], data['category'], amount,
+                data['floatId'], data['location'], status, data.get('currency', 'KES'),
+                exchange_rate, receipt_filename, user_id, approved_by, approved_at,
+                policy_violation, violation_reason, now, now
+            ))
+            
+            if attachment_rows:
+                cursor.executemany(_SQL_INSERT_ATTACHMENT, attachment_rows)
             
-            approvers = cursor.fetchall()
-            for approver in approvers:
-                cursor.execute("""
-                    INSERT INTO notifications (user_id, title, message, type, related_id)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
-                    approver[0], 'New Expense Approval Required',
+            # Create notifications for approvers if not auto-approved
+            if status == 'pending':
+                cursor.execute(_SQL_NOTIFY_APPROVERS, (
+                    'New Expense Approval Required',
                     f'Expense {expense_id} for {data["description"]} requires approval',
-                    'expense_submitted', expense_id
+                    'expense_submitted', expense_id,
+                    data['location'], user_id
                 ))
+            
+            # Expense, attachments and notifications commit together
             conn.commit()
-        
-        response_data = {
-            'expense': {
-                'id': expense_id,
-                'status': status,
-                'amount': ResponseUtils.format_currency(amount, data.get('currency', 'KES')),
-                'policyViolation': {
-                    'hasViolation': policy_violation,
-                    'reason': violation_reason
-                },
-                'attachments': {
-                    'receipt': receipt_filename,
-                    'additionalCount': attachment_count
-                }
+    except Exception:
+        # Nothing references the files if the expense was not written
+        for path in saved_paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        raise
+    
+    # Create audit log
+    create_audit_log(user_id, 'CREATE', 'expenses', expense_id, new_values=data)
+    
+    response_data = {
+        'expense': {
+            'id': expense_id,
+            'status': status,
+            'amount': ResponseUtils.format_currency(amount, data.get('currency', 'KES')),
+            'policyViolation': {
+                'hasViolation': policy_violation,
+                'reason': violation_reason
+            },
+            'attachments': {
+                'receipt': receipt_filename,
+                'additionalCount': attachment_count
             }
         }
-        
-        return APIResponse.success(
-            data=response_data,
-            message=f"Expense {expense_id} created successfully",
-            code=APIResponse.ResponseCode.CREATED
-        )
+    }
+    
+    return APIResponse.success(
+        data=response_data,
+        message=f"Expense {expense_id} created successfully",
+        code=ResponseCode.CREATED
+    )
 
 @expense_bp.route('/<expense_id>/approve', methods=['POST'])
 @jwt_required
@@ -341,7 +478,7 @@ def approve_expense(expense_id):
         if status != 'pending':
             return APIResponse.error(
                 message="Expense is not pending approval",
-                code=APIResponse.ResponseCode.BAD_REQUEST
+                code=ResponseCode.BAD_REQUEST
             )
         
         # Check if user can approve this expense
@@ -353,11 +490,12 @@ def approve_expense(expense_id):
             return APIResponse.forbidden("Only administrators can approve expenses with policy violations")
         
         # Update expense status
+        now = datetime.now(timezone.utc)
         cursor.execute("""
             UPDATE expenses 
             SET status = 'approved', approved_by = ?, approved_at = ?, updated_at = ?
             WHERE id = ?
-        """, (user_id, datetime.now(timezone.utc), datetime.now(timezone.utc), expense_id))
+        """, (user_id, now, now, expense_id))
         
         conn.commit()
         
@@ -417,7 +555,7 @@ def reject_expense(expense_id):
         if status != 'pending':
             return APIResponse.error(
                 message="Expense is not pending approval",
-                code=APIResponse.ResponseCode.BAD_REQUEST
+                code=ResponseCode.BAD_REQUEST
             )
         
         # Check if user can reject this expense
@@ -425,13 +563,13 @@ def reject_expense(expense_id):
             return APIResponse.forbidden("Cannot reject expenses from other branches")
         
         # Update expense status
+        now = datetime.now(timezone.utc)
         cursor.execute("""
             UPDATE expenses 
             SET status = 'rejected', approved_by = ?, approved_at = ?, 
                 rejection_reason = ?, updated_at = ?
             WHERE id = ?
-        """, (user_id, datetime.now(timezone.utc), rejection_reason, 
-              datetime.now(timezone.utc), expense_id))
+        """, (user_id, now, rejection_reason, now, expense_id))
         
         conn.commit()
         
@@ -466,20 +604,7 @@ def get_expense_details(expense_id):
         cursor = conn.cursor()
         
         # Get expense with full details
-        cursor.execute("""
-            SELECT e.*, 
-                   u1.first_name + ' ' + u1.last_name as submitted_by_name,
-                   u1.email as submitted_by_email,
-                   u2.first_name + ' ' + u2.last_name as approved_by_name,
-                   u2.email as approved_by_email,
-                   f.description as float_description,
-                   f.balance as float_balance
-            FROM expenses e
-            LEFT JOIN users u1 ON e.submitted_by = u1.id
-            LEFT JOIN users u2 ON e.approved_by = u2.id
-            LEFT JOIN floats f ON e.float_id = f.id
-            WHERE e.id = ?
-        """, (expense_id,))
+        cursor.execute(_SQL_EXPENSE_DETAIL, (expense_id,))
         
         expense = cursor.fetchone()
         if not expense:
@@ -516,7 +641,7 @@ def get_expense_details(expense_id):
                 'name': expense[21],
                 'email': expense[22]
             } if expense[12] else None,
-            'approvedAt': ResponseUtils.format_datetime(expense[13]),
+            'approvedAt': expense[13],
             'rejectionReason': expense[14],
             'policyViolation': {
                 'hasViolation': bool(expense[15]),
@@ -533,12 +658,12 @@ def get_expense_details(expense_id):
                     'originalName': att[1],
                     'fileType': att[2],
                     'fileSize': att[3],
-                    'uploadedAt': ResponseUtils.format_datetime(att[4])
+                    'uploadedAt': att[4]
                 } for att in attachments
             ],
             'timestamps': {
-                'createdAt': ResponseUtils.format_datetime(expense[17]),
-                'updatedAt': ResponseUtils.format_datetime(expense[18])
+                'createdAt': expense[17],
+                'updatedAt': expense[18]
             }
         }
         
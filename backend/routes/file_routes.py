@@ -1,19 +1,40 @@
 from flask import Blueprint, request, jsonify, send_file, current_app
 import os
 import logging
-from utils.auth import jwt_required
+from werkzeug.utils import safe_join
+from utils.rbac import jwt_required
 
 file_bp = Blueprint('files', __name__)
 
+# Uploaded files never change once written, so clients may reuse them for
+# an hour and revalidate with a conditional GET after that
+FILE_MAX_AGE = 3600
+
 @file_bp.route('/<filename>')
 @jwt_required
 def download_file(filename):
     try:
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        if os.path.exists(file_path):
-            return send_file(file_path)
-        else:
+        # Resolved against the working directory, where uploads are written.
+        # safe_join refuses names that would escape the folder.
+        upload_folder = os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+        file_path = safe_join(upload_folder, filename)
+        if file_path is None:
+            return jsonify({'error': 'File not found'}), 404
+        
+        # Let send_file's own stat/open report a missing file rather than
+        # checking for it first
+        try:
+            response = send_file(
+                file_path, conditional=True, etag=True, max_age=FILE_MAX_AGE
+            )
+        except (FileNotFoundError, IsADirectoryError):
             return jsonify({'error': 'File not found'}), 404
+        
+        # Receipts are only served to signed-in users, so keep them out of
+        # shared caches
+        response.cache_control.public = False
+        response.cache_control.private = True
+        return response
     except Exception as e:
-        logging.error(f"Error downloading file: {str(e)}")
-        return jsonify({'error': 'Failed to download file'}), 500
\ No newline at end of file
+        logging.error("Error downloading file: %s", e)
+        return jsonify({'error': 'Failed to download file'}), 500
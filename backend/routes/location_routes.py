@@ -1,5 +1,5 @@
 from flask import Blueprint, jsonify
-from utils.auth import jwt_required
+from utils.rbac import jwt_required
 
 location_bp = Blueprint('locations', __name__)
 
@@ -1,40 +1,48 @@
-from flask import Blueprint, jsonify, redirect, url_for
-from config.database import get_db_connection
+import hashlib
+import orjson
+from flask import Blueprint, Response, jsonify, redirect, url_for
+from config.database import get_db_context
+from utils.response_handler import etag_cached
 
 main_bp = Blueprint('main', __name__)
 
+# The index never changes, so encode it and its ETag once at import
+_HOME_BYTES = orjson.dumps({
+    "message": "Hotpoint Financial Tracking System API",
+    "endpoints": {
+        "auth": {
+            "test_db": "/api/test (GET)",
+            "signup": "/api/auth/signup (POST)",
+            "login": "/api/auth/login (POST)",
+            "logout": "/api/auth/logout (POST)",
+            "verify": "/api/auth/verify (GET)"
+        },
+        "floats": {
+            "list": "/api/floats (GET)",
+            "create": "/api/floats (POST)",
+            "update": "/api/floats/<id> (PUT)",
+            "delete": "/api/floats/<id> (DELETE)"
+        },
+        "expenses": {
+            "list": "/api/expenses (GET)",
+            "create": "/api/expenses (POST)",
+            "update": "/api/expenses/<id> (PUT)",
+            "approve": "/api/expenses/<id>/approve (POST)",
+            "reject": "/api/expenses/<id>/reject (POST)"
+        },
+        "reports": {
+            "dashboard": "/api/reports/dashboard (GET)",
+            "expenses": "/api/reports/expenses (GET)",
+            "floats": "/api/reports/floats (GET)"
+        }
+    }
+})
+_HOME_ETAG = f'"{hashlib.sha1(_HOME_BYTES).hexdigest()}"'
+
 @main_bp.route('/')
+@etag_cached(max_age=3600, public=True)
 def home():
-    return jsonify({
-        "message": "Hotpoint Financial Tracking System API",
-        "endpoints": {
-            "auth": {
-                "test_db": "/api/test (GET)",
-                "signup": "/api/auth/signup (POST)",
-                "login": "/api/auth/login (POST)",
-                "logout": "/api/auth/logout (POST)",
-                "verify": "/api/auth/verify (GET)"
-            },
-            "floats": {
-                "list": "/api/floats (GET)",
-                "create": "/api/floats (POST)",
-                "update": "/api/floats/<id> (PUT)",
-                "delete": "/api/floats/<id> (DELETE)"
-            },
-            "expenses": {
-                "list": "/api/expenses (GET)",
-                "create": "/api/expenses (POST)",
-                "update": "/api/expenses/<id> (PUT)",
-                "approve": "/api/expenses/<id>/approve (POST)",
-                "reject": "/api/expenses/<id>/reject (POST)"
-            },
-            "reports": {
-                "dashboard": "/api/reports/dashboard (GET)",
-                "expenses": "/api/reports/expenses (GET)",
-                "floats": "/api/reports/floats (GET)"
-            }
-        }
-    })
+    return Response(_HOME_BYTES, mimetype='application/json', headers={'ETag': _HOME_ETAG})
 
 @main_bp.route('/api/')
 def api_root():
@@ -42,12 +50,13 @@ def api_root():
     return redirect(url_for('api_docs'), code=302)
 
 @main_bp.route('/api/test')
+@etag_cached()
 def test_db():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT @@VERSION")
-        version = cursor.fetchone()[0]
+        with get_db_context() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT @@VERSION")
+            version = cursor.fetchone()[0]
         return jsonify({
             "status": "success",
             "sql_server_version": version,
@@ -58,6 +67,3 @@ def test_db():
             "status": "error",
             "message": str(e)
         }), 500
-    finally:
-        if 'conn' in locals():
-            conn.close()
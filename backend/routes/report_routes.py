@@ -1,112 +1,128 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, g, stream_with_context
 import logging
-from config.database import get_db_connection
+import orjson
+from config.database import get_db_context
 from utils.helpers import safe_datetime_format, decimal_to_float
-from utils.auth import jwt_required
+from utils.rbac import jwt_required
 
 report_bp = Blueprint('reports', __name__)
 
+# Rows fetched per round trip when streaming a report
+REPORT_FETCH_SIZE = 1000
+
 @report_bp.route('/dashboard', methods=['GET'])
 @jwt_required
 def get_dashboard_stats():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Get user role to filter data
-        cursor.execute("SELECT role, branch_location FROM users WHERE id = ?", (request.current_user_id,))
-        user_info = cursor.fetchone()
-        
-        if not user_info:
-            return jsonify({'error': 'User not found'}), 404
-        
-        user_role, user_branch = user_info
-        
-        stats = {}
-        
-        # Float statistics
-        if user_role != 'auditor':
+        with get_db_context() as conn:
+            cursor = conn.cursor()
+            
+            # Role and branch come from the verified token
+            user_role = g.current_user['role']
+            user_branch = g.current_user.get('branch_location')
+            
+            # The dashboard sections are independent, so they are sent as one
+            # batch and read back as consecutive result sets: one round trip
+            # instead of one per section
+            queries = []
+            params = []
+            
+            def add_query(sql, *query_params):
+                queries.append(sql)
+                params.extend(query_params)
+            
+            # Float statistics
+            if user_role != 'auditor':
+                if user_role == 'branch':
+                    add_query("""
+                        SELECT COUNT(*), SUM(initial_amount), SUM(used_amount), SUM(balance)
+                        FROM floats WHERE is_active = 1 AND location = ?
+                    """, user_branch)
+                else:
+                    add_query("""
+                        SELECT COUNT(*), SUM(initial_amount), SUM(used_amount), SUM(balance)
+                        FROM floats WHERE is_active = 1
+                    """)
+            
+            # Expense statistics
             if user_role == 'branch':
-                cursor.execute("""
-                    SELECT COUNT(*), SUM(initial_amount), SUM(used_amount), SUM(balance)
-                    FROM floats WHERE is_active = 1 AND location = ?
-                """, (user_branch,))
+                where_clause = "WHERE e.location = ?"
+                and_clause = "AND"
+                branch_params = (user_branch,)
             else:
-                cursor.execute("""
-                    SELECT COUNT(*), SUM(initial_amount), SUM(used_amount), SUM(balance)
-                    FROM floats WHERE is_active = 1
-                """)
-                
-            float_stats = cursor.fetchone()
-            stats['floats'] = {
-                'totalFloats': float_stats[0] or 0,
-                'totalValue': decimal_to_float(float_stats[1]) if float_stats[1] else 0,
-                'totalUsed': decimal_to_float(float_stats[2]) if float_stats[2] else 0,
-                'totalBalance': decimal_to_float(float_stats[3]) if float_stats[3] else 0
-            }
-        
-        # Expense statistics
-        base_expense_query = "FROM expenses e"
-        where_clause = ""
-        params = []
-        
-        if user_role == 'branch':
-            where_clause = " WHERE e.location = ?"
-            params = [user_branch]
-        
-        # Pending approvals (for managers and admins)
-        if user_role in ['admin', 'finance', 'branch']:
-            cursor.execute(f"""
-                SELECT COUNT(*) {base_expense_query} 
-                {where_clause}{"AND" if where_clause else "WHERE"} e.status = 'pending'
-            """, params)
-            stats['pendingApprovals'] = cursor.fetchone()[0] or 0
-        
-        # Policy violations
-        cursor.execute(f"""
-            SELECT COUNT(*) {base_expense_query} 
-            {where_clause}{"AND" if where_clause else "WHERE"} e.policy_violation = 1
-        """, params)
-        stats['policyViolations'] = cursor.fetchone()[0] or 0
-        
-        # Recent expenses
-        cursor.execute(f"""
-            SELECT TOP 5 e.id, e.date, e.description, e.amount, e.currency, e.status
-            {base_expense_query} 
-            {where_clause}
-            ORDER BY e.created_at DESC
-        """, params)
-        
-        recent_expenses = []
-        for row in cursor.fetchall():
-            recent_expenses.append({
+                where_clause = ""
+                and_clause = "WHERE"
+                branch_params = ()
+            
+            # Counts and sums by status come from the indexed totals view
+            # (migration 008) rather than grouping expenses on each request
+            totals_from = "FROM vw_expense_totals e WITH (NOEXPAND)"
+            
+            # Pending approvals (for managers and admins)
+            if user_role in ['admin', 'finance', 'branch']:
+                add_query(f"""
+                    SELECT SUM(e.expense_count) {totals_from}
+                    {where_clause} {and_clause} e.status = 'pending'
+                """, *branch_params)
+            
+            # Policy violations
+            add_query(f"""
+                SELECT COUNT(*) FROM expenses e
+                {where_clause} {and_clause} e.policy_violation = 1
+            """, *branch_params)
+            
+            # Recent expenses
+            add_query(f"""
+                SELECT TOP 5 e.id, e.date, e.description, e.amount, e.currency, e.status
+                FROM expenses e
+                {where_clause}
+                ORDER BY e.created_at DESC
+            """, *branch_params)
+            
+            # Category breakdown
+            add_query(f"""
+                SELECT e.category, SUM(e.expense_count), SUM(e.kes_total)
+                {totals_from}
+                {where_clause} {and_clause} e.status IN ('approved', 'paid')
+                GROUP BY e.category
+            """, *branch_params)
+            
+            cursor.execute(";".join(queries), params)
+            
+            stats = {}
+            
+            if user_role != 'auditor':
+                float_stats = cursor.fetchone()
+                stats['floats'] = {
+                    'totalFloats': float_stats[0] or 0,
+                    'totalValue': decimal_to_float(float_stats[1]) if float_stats[1] else 0,
+                    'totalUsed': decimal_to_float(float_stats[2]) if float_stats[2] else 0,
+                    'totalBalance': decimal_to_float(float_stats[3]) if float_stats[3] else 0
+                }
+                cursor.nextset()
+            
+            if user_role in ['admin', 'finance', 'branch']:
+                stats['pendingApprovals'] = cursor.fetchone()[0] or 0
+                cursor.nextset()
+            
+            stats['policyViolations'] = cursor.fetchone()[0] or 0
+            cursor.nextset()
+            
+            stats['recentExpenses'] = [{
                 'id': row[0],
                 'date': safe_datetime_format(row[1]),
                 'description': row[2],
                 'amount': decimal_to_float(row[3]),
                 'currency': row[4],
                 'status': row[5]
-            })
-        
-        stats['recentExpenses'] = recent_expenses
-        
-        # Category breakdown
-        cursor.execute(f"""
-            SELECT e.category, COUNT(*), SUM(e.amount * e.exchange_rate)
-            {base_expense_query}
-            {where_clause}{"AND" if where_clause else "WHERE"} e.status IN ('approved', 'paid')
-            GROUP BY e.category
-        """, params)
-        
-        category_stats = []
-        for row in cursor.fetchall():
-            category_stats.append({
+            } for row in cursor.fetchall()]
+            cursor.nextset()
+            
+            stats['categoryBreakdown'] = [{
                 'category': row[0],
                 'count': row[1],
                 'total': decimal_to_float(row[2]) if row[2] else 0
-            })
-        
-        stats['categoryBreakdown'] = category_stats
+            } for row in cursor.fetchall()]
         
         return jsonify({
             'message': 'Dashboard statistics retrieved successfully',
@@ -114,20 +130,18 @@ def get_dashboard_stats():
         }), 200
         
     except Exception as e:
-        logging.error(f"Error retrieving dashboard stats: {str(e)}")
+        logging.error("Error retrieving dashboard stats: %s", e)
         return jsonify({'error': 'Failed to retrieve dashboard statistics'}), 500
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
 @report_bp.route('/expenses', methods=['GET'])
 @jwt_required
 def get_expense_reports():
-    """Get detailed expense reports with filtering options"""
+    """Get detailed expense reports with filtering options
+    
+    The report is unbounded, so rows are read in batches and streamed out as
+    JSON instead of being collected into one list first.
+    """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Get query parameters
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
@@ -135,18 +149,14 @@ def get_expense_reports():
         location = request.args.get('location')
         status = request.args.get('status')
         
-        # Get user role to filter data
-        cursor.execute("SELECT role, branch_location FROM users WHERE id = ?", (request.current_user_id,))
-        user_info = cursor.fetchone()
-        
-        if not user_info:
-            return jsonify({'error': 'User not found'}), 404
-        
-        user_role, user_branch = user_info
+        # Role and branch come from the verified token
+        user_role = g.current_user['role']
+        user_branch = g.current_user.get('branch_location')
         
         # Build dynamic query
         base_query = """
-            SELECT e.*, 
+            SELECT e.id, e.date, e.description, e.category, e.amount, e.float_id,
+                   e.location, e.status, e.currency, e.exchange_rate,
                    u1.first_name + ' ' + u1.last_name as submitted_by_name,
                    u2.first_name + ' ' + u2.last_name as approved_by_name,
                    f.description as float_description
@@ -190,145 +200,161 @@ def get_expense_reports():
         
         base_query += " ORDER BY e.created_at DESC"
         
-        cursor.execute(base_query, params)
+        filters = {
+            'startDate': start_date,
+            'endDate': end_date,
+            'category': category,
+            'location': location,
+            'status': status
+        }
         
-        expenses = []
-        total_amount = 0
-        for row in cursor.fetchall():
-            amount_kes = decimal_to_float(row[4]) * decimal_to_float(row[9] or 1)
-            total_amount += amount_kes
-            
-            expense_data = {
-                'id': row[0],
-                'date': safe_datetime_format(row[1]),
-                'description': row[2],
-                'category': row[3],
-                'amount': decimal_to_float(row[4]),
-                'floatId': row[5],
-                'location': row[6],
-                'status': row[7],
-                'currency': row[8],
-                'exchangeRate': decimal_to_float(row[9]) if row[9] else 1,
-                'amountKES': amount_kes,
-                'submittedByName': row[19],
-                'approvedByName': row[20],
-                'floatDescription': row[21]
-            }
-            expenses.append(expense_data)
+        # Run the query and read the first batch before any header is sent,
+        # so a database error still becomes the 500 below
+        report = _stream_expense_report(base_query, params, filters)
+        next(report)
         
-        return jsonify({
-            'message': 'Expense report generated successfully',
-            'expenses': expenses,
-            'summary': {
-                'totalExpenses': len(expenses),
-                'totalAmount': total_amount,
-                'currency': 'KES'
-            },
-            'filters': {
-                'startDate': start_date,
-                'endDate': end_date,
-                'category': category,
-                'location': location,
-                'status': status
-            }
-        }), 200
+        return Response(stream_with_context(report), mimetype='application/json')
         
     except Exception as e:
-        logging.error(f"Error generating expense report: {str(e)}")
+        logging.error("Error generating expense report: %s", e)
         return jsonify({'error': 'Failed to generate expense report'}), 500
-    finally:
-        if 'conn' in locals():
-            conn.close()
+
+def _stream_expense_report(query, params, filters):
+    """Yield the expense report JSON, holding at most one fetch batch in memory
+    
+    The first ``next()`` executes the query, reads the first batch and yields
+    None; the JSON chunks follow. The pooled connection is held until the body
+    has been sent, or the response is closed.
+    """
+    total_expenses = 0
+    total_amount = 0
+    with get_db_context() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, params)
+            rows = cursor.fetchmany(REPORT_FETCH_SIZE)
+            yield None
+            
+            yield b'{"message":"Expense report generated successfully","expenses":['
+            while rows:
+                for row in rows:
+                    amount_kes = decimal_to_float(row[4]) * decimal_to_float(row[9] or 1)
+                    total_amount += amount_kes
+                    
+                    expense_data = {
+                        'id': row[0],
+                        'date': safe_datetime_format(row[1]),
+                        'description': row[2],
+                        'category': row[3],
+                        'amount': decimal_to_float(row[4]),
+                        'floatId': row[5],
+                        'location': row[6],
+                        'status': row[7],
+                        'currency': row[8],
+                        'exchangeRate': decimal_to_float(row[9]) if row[9] else 1,
+                        'amountKES': amount_kes,
+                        'submittedByName': row[10],
+                        'approvedByName': row[11],
+                        'floatDescription': row[12]
+                    }
+                    yield (b',' if total_expenses else b'') + orjson.dumps(expense_data)
+                    total_expenses += 1
+                rows = cursor.fetchmany(REPORT_FETCH_SIZE)
+            
+            yield b'],"summary":' + orjson.dumps({
+                'totalExpenses': total_expenses,
+                'totalAmount': total_amount,
+                'currency': 'KES'
+            }) + b',"filters":' + orjson.dumps(filters) + b'}'
+        except Exception as e:
+            # Before the first yield this becomes the handler's 500; after it
+            # the headers are already sent and the client sees a truncated body
+            logging.error("Error streaming expense report: %s", e)
+            raise
+        finally:
+            cursor.close()
 
 @report_bp.route('/floats', methods=['GET'])
 @jwt_required
 def get_float_reports():
     """Get detailed float reports"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Get user role to filter data
-        cursor.execute("SELECT role, branch_location FROM users WHERE id = ?", (request.current_user_id,))
-        user_info = cursor.fetchone()
-        
-        if not user_info:
-            return jsonify({'error': 'User not found'}), 404
-        
-        user_role, user_branch = user_info
-        
-        # Build query based on user role
-        if user_role == 'branch':
-            query = """
-                SELECT f.*, 
-                       u.first_name + ' ' + u.last_name as created_by_name,
-                       (SELECT COUNT(*) FROM expenses WHERE float_id = f.id) as expense_count,
-                       (SELECT SUM(amount * exchange_rate) FROM expenses WHERE float_id = f.id AND status = 'approved') as total_expenses
-                FROM floats f
-                LEFT JOIN users u ON f.created_by = u.id
-                WHERE f.is_active = 1 AND f.location = ?
-                ORDER BY f.created_at DESC
-            """
-            cursor.execute(query, (user_branch,))
-        else:
-            query = """
-                SELECT f.*, 
-                       u.first_name + ' ' + u.last_name as created_by_name,
-                       (SELECT COUNT(*) FROM expenses WHERE float_id = f.id) as expense_count,
-                       (SELECT SUM(amount * exchange_rate) FROM expenses WHERE float_id = f.id AND status = 'approved') as total_expenses
-                FROM floats f
-                LEFT JOIN users u ON f.created_by = u.id
-                WHERE f.is_active = 1
-                ORDER BY f.created_at DESC
-            """
-            cursor.execute(query)
-        
-        floats = []
-        total_initial = 0
-        total_used = 0
-        total_balance = 0
-        
-        for row in cursor.fetchall():
-            initial_amount = decimal_to_float(row[3])
-            used_amount = decimal_to_float(row[4])
-            balance = decimal_to_float(row[5])
+        with get_db_context() as conn:
+            cursor = conn.cursor()
             
-            total_initial += initial_amount
-            total_used += used_amount
-            total_balance += balance
+            # Role and branch come from the verified token
+            user_role = g.current_user['role']
+            user_branch = g.current_user.get('branch_location')
+            
+            # Build query based on user role
+            if user_role == 'branch':
+                query = """
+                    SELECT f.*, 
+                           u.first_name + ' ' + u.last_name as created_by_name,
+                           (SELECT COUNT(*) FROM expenses WHERE float_id = f.id) as expense_count,
+                           (SELECT SUM(amount * exchange_rate) FROM expenses WHERE float_id = f.id AND status = 'approved') as total_expenses
+                    FROM floats f
+                    LEFT JOIN users u ON f.created_by = u.id
+                    WHERE f.is_active = 1 AND f.location = ?
+                    ORDER BY f.created_at DESC
+                """
+                cursor.execute(query, (user_branch,))
+            else:
+                query = """
+                    SELECT f.*, 
+                           u.first_name + ' ' + u.last_name as created_by_name,
+                           (SELECT COUNT(*) FROM expenses WHERE float_id = f.id) as expense_count,
+                           (SELECT SUM(amount * exchange_rate) FROM expenses WHERE float_id = f.id AND status = 'approved') as total_expenses
+                    FROM floats f
+                    LEFT JOIN users u ON f.created_by = u.id
+                    WHERE f.is_active = 1
+                    ORDER BY f.created_at DESC
+                """
+                cursor.execute(query)
+            
+            floats = []
+            total_initial = 0
+            total_used = 0
+            total_balance = 0
+            
+            for row in cursor.fetchall():
+                initial_amount = decimal_to_float(row[3])
+                used_amount = decimal_to_float(row[4])
+                balance = decimal_to_float(row[5])
+                
+                total_initial += initial_amount
+                total_used += used_amount
+                total_balance += balance
+                
+                float_data = {
+                    'id': row[0],
+                    'description': row[1],
+                    'location': row[2],
+                    'initialAmount': initial_amount,
+                    'usedAmount': used_amount,
+                    'balance': balance,
+                    'status': row[6],
+                    'currency': row[7],
+                    'createdByName': row[12],
+                    'createdAt': safe_datetime_format(row[9]),
+                    'expenseCount': row[13] or 0,
+                    'totalExpenses': decimal_to_float(row[14]) if row[14] else 0,
+                    'utilizationRate': round((used_amount / initial_amount * 100), 2) if initial_amount > 0 else 0
+                }
+                floats.append(float_data)
+            
+            return jsonify({
+                'message': 'Float report generated successfully',
+                'floats': floats,
+                'summary': {
+                    'totalFloats': len(floats),
+                    'totalInitialAmount': total_initial,
+                    'totalUsedAmount': total_used,
+                    'totalBalance': total_balance,
+                    'overallUtilizationRate': round((total_used / total_initial * 100), 2) if total_initial > 0 else 0
+                }
+            }), 200
             
-            float_data = {
-                'id': row[0],
-                'description': row[1],
-                'location': row[2],
-                'initialAmount': initial_amount,
-                'usedAmount': used_amount,
-                'balance': balance,
-                'status': row[6],
-                'currency': row[7],
-                'createdByName': row[12],
-                'createdAt': safe_datetime_format(row[9]),
-                'expenseCount': row[13] or 0,
-                'totalExpenses': decimal_to_float(row[14]) if row[14] else 0,
-                'utilizationRate': round((used_amount / initial_amount * 100), 2) if initial_amount > 0 else 0
-            }
-            floats.append(float_data)
-        
-        return jsonify({
-            'message': 'Float report generated successfully',
-            'floats': floats,
-            'summary': {
-                'totalFloats': len(floats),
-                'totalInitialAmount': total_initial,
-                'totalUsedAmount': total_used,
-                'totalBalance': total_balance,
-                'overallUtilizationRate': round((total_used / total_initial * 100), 2) if total_initial > 0 else 0
-            }
-        }), 200
-        
     except Exception as e:
-        logging.error(f"Error generating float report: {str(e)}")
-        return jsonify({'error': 'Failed to generate float report'}), 500
-    finally:
-        if 'conn' in locals():
-            conn.close()
\ No newline at end of file
+        logging.error("Error generating float report: %s", e)
+        return jsonify({'error': 'Failed to generate float report'}), 500
\ No newline at end of file
@@ -1,31 +1,36 @@
-import json
 import logging
+import orjson
 from datetime import datetime, timezone
-from flask import request
-from config.database import get_db_connection
+from flask import request, has_request_context
+from utils.batch_writer import BatchWriter
 
-def create_audit_log(user_id, action, table_name, record_id, old_values=None, new_values=None):
-    """Create audit log entry"""
+# Audit rows are queued by request threads and inserted in the background,
+# so writing the trail never adds a round trip to the response
+_audit_writer = BatchWriter(
+    'audit_log',
+    """
+        INSERT INTO audit_logs (user_id, action, table_name, record_id, old_values, new_values, ip_address, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """,
+    flush_interval=1.0
+)
+
+def create_audit_log(user_id, action, table_name, record_id, old_values=None, new_values=None, now=None):
+    """Queue an audit log entry for the background writer
+    
+    ``now`` lets a handler stamp the entry with the time it already captured;
+    datetimes inside the value dicts are serialized as ISO-8601.
+    """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO audit_logs (user_id, action, table_name, record_id, old_values, new_values, ip_address, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+        _audit_writer.submit((
             user_id,
             action,
             table_name,
             record_id,
-            json.dumps(old_values) if old_values else None,
-            json.dumps(new_values) if new_values else None,
-            request.remote_addr,
-            datetime.now(timezone.utc)
+            orjson.dumps(old_values).decode('utf-8') if old_values else None,
+            orjson.dumps(new_values).decode('utf-8') if new_values else None,
+            request.remote_addr if has_request_context() else None,
+            now or datetime.now(timezone.utc)
         ))
-        conn.commit()
     except Exception as e:
-        logging.error(f"Failed to create audit log: {str(e)}")
-    finally:
-        if 'conn' in locals():
-            conn.close()
\ No newline at end of file
+        logging.error("Failed to create audit log: %s", e)
@@ -0,0 +1,142 @@
+import logging
+import queue
+import threading
+
+import pyodbc
+
+from config.database import get_db_context
+
+# Errors that mean the database could not be reached, as opposed to a row it
+# refused; rows hit by these are kept for the next flush
+_CONNECTION_ERRORS = (pyodbc.OperationalError, pyodbc.InterfaceError)
+
+# Every writer created in this process, so shutdown can drain them all
+_writers = []
+
+class BatchWriter:
+    """Collect rows from request threads and write them in the background
+
+    Rows are buffered and flushed every ``flush_interval`` seconds with a
+    single ``executemany`` of ``sql``. When ``key`` is given, rows sharing a
+    key are collapsed so only the most recent one is written, or combined
+    with ``merge(earlier, later)`` when that is given.
+
+    If the batch fails, its rows are retried one at a time so a single bad
+    row costs only itself. Rows that could not reach the database are kept
+    and written ahead of newer rows on the next flush.
+    """
+
+    def __init__(self, name, sql, flush_interval=5.0, key=None, merge=None):
+        self.name = name
+        self.sql = sql
+        self.flush_interval = flush_interval
+        self.key = key
+        self.merge = merge
+
+        self._queue = queue.SimpleQueue()
+        self._retry = []
+        self._retry_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        _writers.append(self)
+
+    def submit(self, row):
+        """Queue a parameter tuple for the next flush"""
+        if self._thread is None:
+            self._start()
+        self._queue.put(row)
+
+    def _start(self):
+        # Started on first use so each forked worker runs its own thread
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"batch-writer-{self.name}", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def _drain(self):
+        with self._retry_lock:
+            rows, self._retry = self._retry, []
+        while True:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        if self.key is not None:
+            if self.merge is None:
+                rows = list({self.key(row): row for row in rows}.values())
+            else:
+                merged = {}
+                for row in rows:
+                    k = self.key(row)
+                    merged[k] = self.merge(merged[k], row) if k in merged else row
+                rows = list(merged.values())
+        return rows
+
+    def flush(self):
+        """Write everything queued so far"""
+        rows = self._drain()
+        if not rows:
+            return
+
+        try:
+            with get_db_context() as conn:
+                cursor = conn.cursor()
+                cursor.executemany(self.sql, rows)
+                conn.commit()
+        except Exception as e:
+            logging.warning("Batch writer '%s' batch of %s rows failed, retrying singly: %s",
+                            self.name, len(rows), e)
+            self._write_each(rows)
+
+    def _write_each(self, rows):
+        """Write rows one at a time, dropping only those the database rejects"""
+        done = 0
+        try:
+            with get_db_context() as conn:
+                cursor = conn.cursor()
+                for row in rows:
+                    try:
+                        cursor.execute(self.sql, row)
+                        conn.commit()
+                    except _CONNECTION_ERRORS:
+                        raise
+                    except Exception as e:
+                        conn.rollback()
+                        logging.error("Batch writer '%s' dropped row %r: %s", self.name, row, e)
+                    done += 1
+        except Exception as e:
+            logging.error("Batch writer '%s' could not reach the database, keeping %s rows: %s",
+                          self.name, len(rows) - done, e)
+            with self._retry_lock:
+                self._retry[:0] = rows[done:]
+
+    def discard(self, key):
+        """Drop queued rows for ``key`` that have not been written yet
+
+        A row already taken by a flush in progress is not affected.
+        """
+        if self._queue.empty() and not self._retry:
+            return
+        rows = [row for row in self._drain() if self.key(row) != key]
+        with self._retry_lock:
+            self._retry[:0] = rows
+
+    def stop(self):
+        """Stop the background thread and write any remaining rows"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+def stop_batch_writers():
+    """Drain every batch writer; call before the DB pool is closed"""
+    for writer in _writers:
+        writer.stop()
@@ -0,0 +1,39 @@
+import threading
+import time
+
+class TTLCache:
+    """Small thread-safe in-process cache whose entries expire after ``ttl`` seconds
+
+    When ``maxsize`` is reached, expired entries are pruned first and then the
+    oldest insertion is dropped.
+    """
+
+    def __init__(self, ttl, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return default
+        return entry[0]
+
+    def set(self, key, value):
+        now = time.monotonic()
+        with self._lock:
+            if key not in self._data and len(self._data) >= self.maxsize:
+                for stale in [k for k, entry in self._data.items() if entry[1] <= now]:
+                    del self._data[stale]
+                if len(self._data) >= self.maxsize:
+                    del self._data[next(iter(self._data))]
+            self._data[key] = (value, now + self.ttl)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
@@ -1,18 +1,18 @@
 import logging
 from datetime import datetime, timezone
 from flask import jsonify
-from utils.response_handler import APIResponse
+from utils.response_handler import APIResponse, ResponseCode
 
 def enhance_login_error_handling():
     """Enhanced error handling utilities for login route"""
     
     def log_login_attempt(email, role, request_id):
         """Log login attempts with request ID for tracking"""
-        logging.info(f"[{request_id}] Login attempt: email={email}, role={role}")
+        logging.info("[%s] Login attempt: email=%s, role=%s", request_id, email, role)
     
     def handle_login_error(error, request_id):
         """Handle login errors with detailed information"""
-        logging.error(f"[{request_id}] Login error: {str(error)}")
+        logging.error("[%s] Login error: %s", request_id, error)
         
         if "Invalid email or password" in str(error):
             return APIResponse.unauthorized("Invalid email or password")
@@ -20,7 +20,7 @@ def enhance_login_error_handling():
             return APIResponse.error(
                 message="Account temporarily locked",
                 details="Too many failed attempts. Try again in 30 minutes.",
-                code=429
+                code=ResponseCode.TOO_MANY_REQUESTS
             )
         elif "Account disabled" in str(error):
             return APIResponse.forbidden("Account has been disabled")
@@ -28,7 +28,7 @@ def enhance_login_error_handling():
             return APIResponse.error(
                 message="An unexpected error occurred",
                 details="Please try again later",
-                code=500
+                code=ResponseCode.INTERNAL_SERVER_ERROR
             )
     
     return {
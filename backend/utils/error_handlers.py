@@ -1,23 +0,0 @@
-from flask import jsonify, request
-
-def register_error_handlers(app):
-    """Register error handlers for the Flask app"""
-    
-    @app.errorhandler(404)
-    def not_found(error):
-        return jsonify({
-            'error': 'Not found',
-            'message': 'The requested resource was not found'
-        }), 404
-
-    @app.errorhandler(500)
-    def internal_error(error):
-        return jsonify({
-            'error': 'Internal server error',
-            'message': 'An unexpected error occurred'
-        }), 500
-
-    @app.before_request
-    def log_request_info():
-        import logging
-        logging.info(f"Request: {request.method} {request.path}")
\ No newline at end of file
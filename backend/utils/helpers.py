@@ -1,20 +1,33 @@
 from decimal import Decimal
 import re
+import shutil
 from datetime import datetime
+from dateutil import parser as date_parser
+
+EMAIL_DOMAIN = '@hotpoint.co.ke'
+# Longest address allowed by RFC 5321
+MAX_EMAIL_LENGTH = 254
+# Matched with fullmatch: "$" would also accept a trailing newline
+EMAIL_RE = re.compile(r"[a-zA-Z0-9._%+-]+@hotpoint\.co\.ke")
+
+ALLOWED_EXTENSIONS = frozenset({'doc', 'pdf', 'png', 'jpg', 'jpeg', 'docx'})
+
+# Copy size when writing uploads to disk
+UPLOAD_CHUNK_SIZE = 1 << 20
 
 def safe_datetime_format(dt_value):
     """Safely convert datetime value to ISO format string"""
     if dt_value is None:
         return None
+    # pyodbc returns datetime/date objects for SQL Server date columns
+    if hasattr(dt_value, 'isoformat'):
+        return dt_value.isoformat()
     if isinstance(dt_value, str):
         try:
-            from dateutil import parser
-            parsed_dt = parser.parse(dt_value)
+            parsed_dt = date_parser.parse(dt_value)
             return parsed_dt.isoformat()
         except:
             return dt_value
-    if hasattr(dt_value, 'isoformat'):
-        return dt_value.isoformat()
     return str(dt_value)  # Fallback to string conversion
 
 def decimal_to_float(obj):
@@ -25,8 +38,10 @@ def decimal_to_float(obj):
 
 def validate_email(email):
     """Validate email format for hotpoint domain"""
-    pattern = r"^[a-zA-Z0-9._%+-]+@hotpoint\.co\.ke$"
-    return re.match(pattern, email) is not None
+    # Cheap structural checks reject junk input before the regex runs
+    if not email or len(email) > MAX_EMAIL_LENGTH or not email.endswith(EMAIL_DOMAIN) or email.count('@') != 1:
+        return False
+    return EMAIL_RE.fullmatch(email) is not None
 
 def validate_password(password):
     """Validate password strength"""
@@ -36,6 +51,11 @@ def validate_password(password):
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
-    ALLOWED_EXTENSIONS = {'doc', 'pdf', 'png', 'jpg', 'jpeg', 'docx'}
     return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
\ No newline at end of file
+           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def save_upload(file_storage, path):
+    """Copy an uploaded file to ``path`` in fixed-size chunks; returns its size in bytes"""
+    with open(path, 'wb') as dst:
+        shutil.copyfileobj(file_storage.stream, dst, UPLOAD_CHUNK_SIZE)
+        return dst.tell()
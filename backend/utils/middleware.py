@@ -0,0 +1,80 @@
+import logging
+import time
+
+# Sent on every response; frozen once so start_response only extends a list.
+# WSGI requires native str header pairs, so these are str rather than bytes.
+SECURITY_HEADERS = (
+    ('X-Content-Type-Options', 'nosniff'),
+    ('X-Frame-Options', 'DENY'),
+    ('X-XSS-Protection', '1; mode=block'),
+)
+
+class RequestTimingMiddleware:
+    """WSGI middleware adding security headers, X-Response-Time and a request log
+
+    Runs outside Flask, so no Request/Response objects or ``g`` are touched.
+    """
+
+    def __init__(self, wsgi_app, logger, quiet_paths=()):
+        self.wsgi_app = wsgi_app
+        self.logger = logger
+        # Probe endpoints (e.g. /health) that are timed but not logged
+        self.quiet_paths = frozenset(quiet_paths)
+
+    def __call__(self, environ, start_response):
+        start = time.perf_counter()
+        logger = self.logger
+        quiet_paths = self.quiet_paths
+
+        def timed_start_response(status, headers, exc_info=None):
+            duration_ms = (time.perf_counter() - start) * 1000
+            headers.extend(SECURITY_HEADERS)
+            headers.append(('X-Response-Time', f"{duration_ms:.2f}ms"))
+            # One record per request; fields are also attached for structured handlers
+            path = environ.get('PATH_INFO')
+            if path not in quiet_paths and logger.isEnabledFor(logging.INFO):
+                method = environ.get('REQUEST_METHOD')
+                code = status[:3]
+                logger.info("%s %s %s %.1fms", method, path, code, duration_ms, extra={
+                    'method': method, 'path': path, 'status': int(code), 'duration_ms': duration_ms
+                })
+            return start_response(status, headers, exc_info)
+
+        return self.wsgi_app(environ, timed_start_response)
+
+
+class CORSMiddleware:
+    """Static CORS for the single allowed frontend origin
+
+    Preflight requests are answered here without entering Flask; every other
+    response gets the fixed allow/expose headers appended.
+    """
+
+    def __init__(self, wsgi_app, origin, methods, headers, expose_headers, max_age=86400):
+        self.wsgi_app = wsgi_app
+        self.response_headers = (
+            ('Access-Control-Allow-Origin', origin),
+            ('Access-Control-Expose-Headers', ', '.join(expose_headers)),
+            ('Vary', 'Origin'),
+        )
+        self.preflight_headers = (
+            ('Access-Control-Allow-Origin', origin),
+            ('Access-Control-Allow-Methods', ', '.join(methods)),
+            ('Access-Control-Allow-Headers', ', '.join(headers)),
+            ('Access-Control-Max-Age', str(max_age)),
+            ('Vary', 'Origin'),
+            ('Content-Length', '0'),
+        ) + SECURITY_HEADERS
+
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD') == 'OPTIONS' and 'HTTP_ACCESS_CONTROL_REQUEST_METHOD' in environ:
+            start_response('204 No Content', list(self.preflight_headers))
+            return []
+
+        response_headers = self.response_headers
+
+        def cors_start_response(status, headers, exc_info=None):
+            headers.extend(response_headers)
+            return start_response(status, headers, exc_info)
+
+        return self.wsgi_app(environ, cors_start_response)
@@ -0,0 +1,77 @@
+import hmac
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHash, VerificationError
+
+# argon2id parameters for every new hash. Raising either one raises the
+# CPU/memory cost of hashing and of every later login check.
+ARGON2_TIME_COST = int(os.environ.get('ARGON2_TIME_COST', '2'))
+ARGON2_MEMORY_COST = int(os.environ.get('ARGON2_MEMORY_COST', '65536'))  # KiB
+# Lanes per hash. >1 spreads one hash over several cores (lower login latency)
+# at the cost of fewer hashes running side by side under load.
+ARGON2_PARALLELISM = int(os.environ.get('ARGON2_PARALLELISM', '1'))
+
+_hasher = PasswordHasher(
+    time_cost=ARGON2_TIME_COST,
+    memory_cost=ARGON2_MEMORY_COST,
+    parallelism=ARGON2_PARALLELISM
+)
+
+# Both KDFs release the GIL, so a pool sized to the core count lets concurrent
+# logins hash in parallel while capping how much CPU hashing can take at once.
+_hash_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix='pwhash')
+
+def hash_password(password):
+    """Hash a plaintext password for storage (argon2id)"""
+    return _hash_executor.submit(_hasher.hash, password).result()
+
+def check_password(password, password_hash):
+    """Check a plaintext password against a stored argon2id or legacy bcrypt hash"""
+    if isinstance(password_hash, bytes):
+        password_hash = password_hash.decode('utf-8')
+    try:
+        if password_hash.startswith('$argon2'):
+            ok = _hash_executor.submit(_hasher.verify, password_hash, password).result()
+        else:
+            ok = _hash_executor.submit(
+                bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8')
+            ).result()
+    except VerificationError:
+        return False
+    except (ValueError, InvalidHash):
+        # Malformed hash in the database - treat as a failed check, not a 500
+        logging.warning("Stored password hash has an invalid format")
+        return False
+    return ok
+
+def dummy_check_password(password):
+    """Spend the same work as a real check, for logins with an unknown email
+    
+    Without this, "no such user" returns measurably faster than "wrong
+    password", which lets callers enumerate registered emails.
+    """
+    check_password(password, _DUMMY_HASH)
+    return False
+
+def needs_rehash(password_hash):
+    """True for legacy bcrypt hashes and argon2 hashes with outdated parameters"""
+    if isinstance(password_hash, bytes):
+        password_hash = password_hash.decode('utf-8')
+    if not password_hash.startswith('$argon2'):
+        return True
+    try:
+        return _hasher.check_needs_rehash(password_hash)
+    except InvalidHash:
+        return True
+
+def constant_time_equals(a, b):
+    """Compare two strings without leaking the mismatch position via timing"""
+    if a is None or b is None:
+        return False
+    return hmac.compare_digest(str(a).encode('utf-8'), str(b).encode('utf-8'))
+
+# Hash of a random value with the current parameters, used by dummy_check_password
+_DUMMY_HASH = _hasher.hash(os.urandom(16).hex())
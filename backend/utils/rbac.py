@@ -1,9 +1,13 @@
 import jwt
 from datetime import datetime, timedelta, timezone
 from flask import request, jsonify, current_app, g
-from functools import wraps
+from functools import wraps, lru_cache
 from config.database import get_db_context
+import hashlib
 import logging
+import threading
+import time
+import uuid
 from enum import Enum
 
 class Role(Enum):
@@ -122,80 +126,146 @@ ROLE_PERMISSIONS = {
     ]
 }
 
+# Permission values per role name, resolved once; the role set is fixed
+ROLE_PERMISSION_VALUES = {
+    role.value: tuple(perm.value for perm in perms)
+    for role, perms in ROLE_PERMISSIONS.items()
+}
+
+# Permission members per role name, for O(1) membership checks
+ROLE_PERMISSION_SETS = {
+    role.value: frozenset(perms)
+    for role, perms in ROLE_PERMISSIONS.items()
+}
+
 class RBACManager:
     @staticmethod
     def has_permission(user_role, permission):
         """Check if a user role has a specific permission"""
-        try:
-            role_enum = Role(user_role)
-            return permission in ROLE_PERMISSIONS.get(role_enum, [])
-        except ValueError:
-            return False
+        return permission in ROLE_PERMISSION_SETS.get(user_role, frozenset())
     
     @staticmethod
     def has_any_permission(user_role, permissions):
         """Check if user has any of the specified permissions"""
-        return any(RBACManager.has_permission(user_role, perm) for perm in permissions)
+        return not ROLE_PERMISSION_SETS.get(user_role, frozenset()).isdisjoint(permissions)
     
     @staticmethod
     def has_all_permissions(user_role, permissions):
         """Check if user has all specified permissions"""
-        return all(RBACManager.has_permission(user_role, perm) for perm in permissions)
+        return ROLE_PERMISSION_SETS.get(user_role, frozenset()).issuperset(permissions)
     
     @staticmethod
     def get_user_permissions(user_role):
-        """Get all permissions for a user role"""
-        try:
-            role_enum = Role(user_role)
-            return [perm.value for perm in ROLE_PERMISSIONS.get(role_enum, [])]
-        except ValueError:
-            return []
+        """Get all permissions for a user role (a shared, immutable tuple)"""
+        return ROLE_PERMISSION_VALUES.get(user_role, ())
 
-def create_jwt_token(user_id):
-    """Create JWT token with enhanced payload"""
+# One PyJWT instance for the process; HS256 keys are pre-encoded per secret
+_jwt = jwt.PyJWT()
+
+@lru_cache(maxsize=4)
+def _signing_key(secret):
+    """Encode the JWT secret once rather than on every encode/decode"""
+    return secret.encode('utf-8')
+
+def create_jwt_token(user, now=None, token_version=0):
+    """Create JWT token with enhanced payload
+    
+    ``user`` is the user's API response dict; its non-sensitive fields are
+    embedded as a ``profile`` claim so token checks don't need the users table.
+    ``token_version`` is the user's current users.token_version; the token
+    stops being accepted once that column moves on.
+    """
     try:
-        with get_db_context() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT role, branch_location, is_active, first_name, last_name 
-                FROM users WHERE id = ?
-            """, (user_id,))
-            user_info = cursor.fetchone()
-            
-            if not user_info or not user_info[2]:  # is_active check
-                return None
-                
-            role, branch_location, is_active, first_name, last_name = user_info
-            
-            payload = {
-                'user_id': user_id,
-                'role': role,
-                'branch_location': branch_location,
-                'permissions': RBACManager.get_user_permissions(role),
-                'full_name': f"{first_name} {last_name}",
-                'exp': datetime.now(timezone.utc) + timedelta(hours=24),
-                'iat': datetime.now(timezone.utc)
-            }
-            
-            return jwt.encode(payload, current_app.config['JWT_SECRET_KEY'], algorithm='HS256')
+        if now is None:
+            now = datetime.now(timezone.utc)
+        
+        if not user or not user.get('isActive'):
+            return None
+        
+        payload = {
+            'user_id': user['id'],
+            'role': user['role'],
+            'branch_location': user.get('branchLocation'),
+            'permissions': RBACManager.get_user_permissions(user['role']),
+            'full_name': user.get('fullName'),
+            'profile': {k: v for k, v in user.items() if k != 'permissions'},
+            'jti': uuid.uuid4().hex,
+            'ver': token_version,
+            'exp': now + timedelta(hours=24),
+            'iat': now
+        }
+        
+        return _jwt.encode(payload, _signing_key(current_app.config['JWT_SECRET_KEY']), algorithm='HS256')
     except Exception as e:
-        logging.error(f"Error creating JWT token: {str(e)}")
+        logging.error("Error creating JWT token: %s", e)
         return None
 
+# Recently verified tokens: digest -> (payload, cached_until, user generation).
+# A hit skips signature decoding and the users query. The worker that handles
+# a logout or password change drops the user's entries at once; every other
+# worker keeps accepting a revoked token, or a deactivated user, for up to
+# VERIFIED_TOKEN_TTL seconds.
+VERIFIED_TOKEN_TTL = 60.0
+VERIFIED_TOKEN_MAX = 10000
+_verified_tokens = {}
+_verified_lock = threading.Lock()
+
+# Bumped by invalidate_user_tokens to drop a user's cached verifications
+_user_generations = {}
+
+def invalidate_user_tokens(user_id):
+    """Force the next request from this user's tokens through full verification"""
+    with _verified_lock:
+        _user_generations[user_id] = _user_generations.get(user_id, 0) + 1
+
+def _token_digest(token):
+    return hashlib.blake2b(token.encode('utf-8'), digest_size=16).digest()
+
+def _cached_payload(digest):
+    entry = _verified_tokens.get(digest)
+    if entry is None:
+        return None
+    payload, cached_until, generation = entry
+    if time.time() >= cached_until or generation != _user_generations.get(payload['user_id'], 0):
+        return None
+    return payload
+
+def _cache_payload(digest, payload):
+    now = time.time()
+    # Never serve a token from the cache past its own expiry
+    cached_until = min(now + VERIFIED_TOKEN_TTL, payload.get('exp', now))
+    with _verified_lock:
+        if len(_verified_tokens) >= VERIFIED_TOKEN_MAX:
+            for stale in [k for k, entry in _verified_tokens.items() if entry[1] <= now]:
+                del _verified_tokens[stale]
+            if len(_verified_tokens) >= VERIFIED_TOKEN_MAX:
+                # Still full of live entries: drop the oldest
+                del _verified_tokens[next(iter(_verified_tokens))]
+        _verified_tokens[digest] = (payload, cached_until, _user_generations.get(payload['user_id'], 0))
+
 def verify_jwt_token(token):
     """Verify JWT token and return payload"""
     try:
-        payload = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
+        digest = _token_digest(token)
+        payload = _cached_payload(digest)
+        if payload is not None:
+            return payload
         
-        # Verify user is still active
+        payload = _jwt.decode(token, _signing_key(current_app.config['JWT_SECRET_KEY']), algorithms=['HS256'])
+        
+        # Verify user is still active and the token has not been revoked
         with get_db_context() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT is_active FROM users WHERE id = ?", (payload['user_id'],))
+            cursor.execute("SELECT is_active, token_version FROM users WHERE id = ?", (payload['user_id'],))
             user = cursor.fetchone()
-            
-            if not user or not user[0]:
-                return None
-                
+        
+        if not user or not user[0]:
+            return None
+        if user[1] != payload.get('ver', 0):
+            logging.warning("Revoked JWT token presented")
+            return None
+        
+        _cache_payload(digest, payload)
         return payload
     except jwt.ExpiredSignatureError:
         logging.warning("JWT token expired")
@@ -204,24 +274,23 @@ def verify_jwt_token(token):
         logging.warning("Invalid JWT token")
         return None
     except Exception as e:
-        logging.error(f"Error verifying JWT token: {str(e)}")
+        logging.error("Error verifying JWT token: %s", e)
         return None
 
 def jwt_required(f):
     """JWT required decorator with enhanced user context"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        if not token:
+        # Clients must send "Authorization: Bearer <token>"; anything else is
+        # treated as a missing token
+        header = request.headers.get('Authorization')
+        if not header or len(header) <= 7 or header[:7] != 'Bearer ':
             return jsonify({
                 'error': 'Authentication required',
                 'message': 'Authorization token is missing'
             }), 401
         
-        if token.startswith('Bearer '):
-            token = token[7:]
-        
-        payload = verify_jwt_token(token)
+        payload = verify_jwt_token(header[7:])
         if not payload:
             return jsonify({
                 'error': 'Authentication failed',
@@ -234,7 +303,11 @@ def jwt_required(f):
             'role': payload['role'],
             'branch_location': payload.get('branch_location'),
             'permissions': payload.get('permissions', []),
-            'full_name': payload.get('full_name')
+            'full_name': payload.get('full_name'),
+            'profile': payload.get('profile'),
+            'jti': payload.get('jti'),
+            'exp': payload.get('exp'),
+            'iat': payload.get('iat')
         }
         
         # Backwards compatibility
@@ -283,29 +356,35 @@ def require_all_permissions(*required_permissions):
 
 def require_roles(*required_roles):
     """Decorator to require specific roles"""
+    allowed_roles = frozenset(role.value for role in required_roles)
+    message = f'Required roles: {[role.value for role in required_roles]}'
+    
     def decorator(f):
         @wraps(f)
         @jwt_required
         def decorated_function(*args, **kwargs):
             user_role = g.current_user['role']
             
-            if user_role not in [role.value for role in required_roles]:
+            if user_role not in allowed_roles:
                 return jsonify({
                     'error': 'Insufficient privileges',
-                    'message': f'Required roles: {[role.value for role in required_roles]}'
+                    'message': message
                 }), 403
             
             return f(*args, **kwargs)
         return decorated_function
     return decorator
 
+# Roles that see every branch's data
+ALL_BRANCH_ROLES = frozenset({Role.ADMIN.value, Role.FINANCE.value, Role.AUDITOR.value})
+
 def can_access_branch_data(target_branch_location):
     """Check if user can access data from a specific branch"""
     user_role = g.current_user['role']
     user_branch = g.current_user.get('branch_location')
     
     # Admin, finance, auditor can access all branches
-    if user_role in ['admin', 'finance', 'auditor']:
+    if user_role in ALL_BRANCH_ROLES:
         return True
     
     # Branch managers can only access their own branch
@@ -1,8 +1,11 @@
 # utils/response_handler.py
-from flask import jsonify, current_app
-from datetime import datetime
+from flask import current_app, request, make_response
+from datetime import datetime, timezone
+from functools import wraps
+import hashlib
 import logging
 from enum import Enum
+from utils.json_provider import fast_json
 
 class ResponseStatus(Enum):
     SUCCESS = "success"
@@ -40,7 +43,7 @@ class APIResponse:
         response_body = {
             "status": ResponseStatus.SUCCESS.value,
             "message": message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": datetime.now(timezone.utc),
             "code": code.value
         }
         
@@ -50,7 +53,7 @@ class APIResponse:
         if meta is not None:
             response_body["meta"] = meta
             
-        return jsonify(response_body), code.value
+        return fast_json(response_body, code.value)
     
     @staticmethod
     def error(message="An error occurred", code=ResponseCode.INTERNAL_SERVER_ERROR, 
@@ -59,7 +62,7 @@ class APIResponse:
         response_body = {
             "status": ResponseStatus.ERROR.value,
             "message": message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": datetime.now(timezone.utc),
             "code": code.value
         }
         
@@ -70,11 +73,11 @@ class APIResponse:
             response_body["error_code"] = error_code
             
         # Log error for debugging
-        logging.error(f"API Error: {message} - Code: {code.value}")
+        logging.error("API Error: %s - Code: %s", message, code.value)
         if details:
-            logging.error(f"Error details: {details}")
+            logging.error("Error details: %s", details)
             
-        return jsonify(response_body), code.value
+        return fast_json(response_body, code.value)
     
     @staticmethod
     def validation_error(message="Validation failed", errors=None):
@@ -82,14 +85,14 @@ class APIResponse:
         response_body = {
             "status": ResponseStatus.ERROR.value,
             "message": message,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": datetime.now(timezone.utc),
             "code": ResponseCode.UNPROCESSABLE_ENTITY.value
         }
         
         if errors:
             response_body["validation_errors"] = errors
             
-        return jsonify(response_body), ResponseCode.UNPROCESSABLE_ENTITY.value
+        return fast_json(response_body, ResponseCode.UNPROCESSABLE_ENTITY.value)
     
     @staticmethod
     def not_found(resource="Resource", resource_id=None):
@@ -152,6 +155,30 @@ class APIResponse:
             message=message,
             meta=meta
         )
+    
+    @staticmethod
+    def cursor_paginated_success(data, next_cursor, per_page, message="Data retrieved successfully"):
+        """Create a keyset-paginated success response; pass next_cursor back to get the next page"""
+        meta = {
+            "pagination": {
+                "per_page": per_page,
+                "next_cursor": next_cursor,
+                "has_next": next_cursor is not None
+            }
+        }
+        
+        return APIResponse.success(
+            data=data,
+            message=message,
+            meta=meta
+        )
+    
+    @staticmethod
+    def not_modified(etag):
+        """Create an empty 304 response for a matching If-None-Match"""
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
 
 # Decorators for common response patterns
 def handle_exceptions(f):
@@ -172,7 +199,7 @@ def handle_exceptions(f):
         except FileNotFoundError as e:
             return APIResponse.not_found("File")
         except Exception as e:
-            logging.exception(f"Unhandled exception in {f.__name__}")
+            logging.exception("Unhandled exception in %s", f.__name__)
             return APIResponse.error(
                 message="An unexpected error occurred",
                 details=str(e) if current_app.debug else None
@@ -180,6 +207,29 @@ def handle_exceptions(f):
     
     return decorated_function
 
+def etag_cached(max_age=None, public=False):
+    """Decorator adding a content ETag so repeat GETs can be answered with 304"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            response = make_response(f(*args, **kwargs))
+            if request.method not in ('GET', 'HEAD') or response.status_code != 200:
+                return response
+            
+            # Views serving a fixed body may set a precomputed ETag themselves
+            if response.get_etag()[0] is None:
+                response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+            if max_age is not None:
+                response.cache_control.max_age = max_age
+                if public:
+                    response.cache_control.public = True
+                else:
+                    response.cache_control.private = True
+            return response.make_conditional(request)
+        
+        return decorated_function
+    return decorator
+
 def validate_json_request(required_fields=None, optional_fields=None):
     """Decorator to validate JSON request data"""
     from functools import wraps
@@ -0,0 +1,11 @@
+"""WSGI entry point for running the API under a production server.
+
+    uwsgi --ini uwsgi.ini                          (Linux)
+    waitress-serve --port=5000 --threads=16 wsgi:app    (Windows)
+
+pyodbc blocks inside the ODBC driver, so concurrency comes from worker
+processes and threads rather than gevent greenlets.
+"""
+from app import create_app
+
+app = create_app()